@@ -0,0 +1,56 @@
+# Throughput and latency of the built-in asyncio proxy engine, compared to
+# requesting the stub backends directly.
+#
+# usage: python -m benchmarks.asyncio_engine [--backends N] [--concurrency N] [--duration S]
+
+import argparse
+import asyncio
+import tempfile
+from docker_container_proxy import HTTPProxyServer, DashboardServer, AsyncioProxyEngine
+from .load import start_stub_backends, server_port, build_proxy, drive_load
+
+
+async def benchmark(backend_count: int, concurrency: int, duration: float) -> None:
+    backends = await start_stub_backends(backend_count)
+    proxy = build_proxy([server_port(backend) for backend in backends], listen=0)
+    with tempfile.TemporaryDirectory() as static_path:
+        engine = AsyncioProxyEngine(proxy, static_path)
+        engine_server = await engine.start("127.0.0.1")
+
+        direct = await drive_load(server_port(backends[0]), ["direct"], concurrency, duration)
+        print(f"{'direct':<12}{direct.summary()}")
+        proxied = await drive_load(
+            server_port(engine_server),
+            [server.server_name for server in proxy.servers if isinstance(server, HTTPProxyServer)],
+            concurrency,
+            duration,
+        )
+        print(f"{'proxied':<12}{proxied.summary()}")
+        dashboard = await drive_load(
+            server_port(engine_server),
+            [server.server_name for server in proxy.servers if isinstance(server, DashboardServer)],
+            concurrency,
+            duration,
+        )
+        print(f"{'dashboard':<12}{dashboard.summary()}")
+        print(f"upstream connections opened: {engine.pool.connections_opened}")
+
+        engine_server.close()
+        engine.pool.close()
+    for backend in backends:
+        backend.close()
+    # let the backends notice the closed connections before the loop goes away
+    await asyncio.sleep(0.1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the built-in asyncio proxy engine.")
+    parser.add_argument("--backends", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=3.0)
+    args = parser.parse_args()
+    asyncio.run(benchmark(args.backends, args.concurrency, args.duration))
+
+
+if __name__ == "__main__":
+    main()
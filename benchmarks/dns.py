@@ -0,0 +1,90 @@
+# Queries per second answered by the DNS responder, with a local query generator
+# keeping a number of queries in flight, for a mix of proxied and unknown names.
+#
+# usage: python -m benchmarks.dns [--backends N] [--in-flight N] [--duration S]
+
+import argparse
+import asyncio
+import itertools
+import struct
+import time
+from typing import Any, Iterator, Optional, Union, cast
+from docker_container_proxy import DNSResponder
+from .load import build_proxy
+
+
+def build_query(name: str, record_type: int = 1, query_id: int = 0) -> bytes:
+    header = struct.pack("!HHHHHH", query_id, 0x0100, 1, 0, 0, 0)
+    labels = b"".join(
+        bytes((len(label),)) + label.encode() for label in name.split(".") if label
+    )
+    return header + labels + b"\0" + struct.pack("!HH", record_type, 1)
+
+
+class QueryGenerator(asyncio.DatagramProtocol):
+
+    def __init__(self, names: Iterator[str], deadline: float) -> None:
+        self.names = names
+        self.deadline = deadline
+        self.transport: Optional[asyncio.DatagramTransport] = None
+        self.sent_at: dict[int, float] = {}
+        self.latencies: list[float] = []
+        self.query_ids = itertools.cycle(range(65536))
+        self.done = asyncio.get_running_loop().create_future()
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self.transport = cast(asyncio.DatagramTransport, transport)
+
+    def send(self) -> None:
+        assert self.transport is not None
+        query_id = next(self.query_ids)
+        self.sent_at[query_id] = time.perf_counter()
+        self.transport.sendto(build_query(next(self.names), query_id=query_id))
+
+    def datagram_received(self, data: bytes, addr: tuple[Union[str, Any], int]) -> None:
+        now = time.perf_counter()
+        (query_id,) = struct.unpack("!H", data[:2])
+        self.latencies.append(now - self.sent_at.pop(query_id))
+        if now < self.deadline:
+            self.send()
+        elif not self.sent_at and not self.done.done():
+            self.done.set_result(None)
+
+
+async def benchmark(backend_count: int, in_flight: int, duration: float) -> None:
+    proxy = build_proxy(list(range(9000, 9000 + backend_count)), listen=8080)
+    responder = DNSResponder(proxy, "127.0.0.1")
+    transport = await responder.start(0)
+    port = transport.get_extra_info("sockname")[1]
+    names = [server.server_name for server in proxy.servers] + ["unknown.test", "example.com"]
+    generator = QueryGenerator(itertools.cycle(names), time.perf_counter() + duration)
+    client, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+        lambda: generator,
+        remote_addr=("127.0.0.1", port),
+    )
+    start = time.perf_counter()
+    for _ in range(in_flight):
+        generator.send()
+    await asyncio.wait_for(generator.done, duration + 5)
+    elapsed = time.perf_counter() - start
+    latencies = sorted(generator.latencies)
+    print(
+        f"{len(latencies)} queries, {len(latencies) / elapsed:.0f}/s,"
+        f" p50 {latencies[len(latencies) // 2] * 1e6:.0f} us,"
+        f" p99 {latencies[int(len(latencies) * 0.99)] * 1e6:.0f} us"
+    )
+    client.close()
+    transport.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the DNS responder.")
+    parser.add_argument("--backends", type=int, default=50)
+    parser.add_argument("--in-flight", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=3.0)
+    args = parser.parse_args()
+    asyncio.run(benchmark(args.backends, args.in_flight, args.duration))
+
+
+if __name__ == "__main__":
+    main()
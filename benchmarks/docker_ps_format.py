@@ -0,0 +1,86 @@
+# Size and parsing time of the docker ps output in the full --format=json record,
+# compared to the minimal docker_ps_format one. Both are synthesized, roughly the
+# way docker ps prints Compose containers, so that no Docker daemon is needed.
+#
+# usage: python -m benchmarks.docker_ps_format [--containers N] [--repeat N]
+
+import argparse
+import json
+import time
+from docker_container_proxy import parse_containers
+
+COMPOSE_LABELS = {
+    "com.docker.compose.config-hash": "9f" * 32,
+    "com.docker.compose.container-number": "1",
+    "com.docker.compose.depends_on": "db:service_started:false",
+    "com.docker.compose.image": "sha256:" + "ab" * 32,
+    "com.docker.compose.oneoff": "False",
+    "com.docker.compose.project": "shop",
+    "com.docker.compose.project.config_files": "/home/dev/shop/docker-compose.yml",
+    "com.docker.compose.project.working_dir": "/home/dev/shop",
+    "com.docker.compose.replace": "",
+    "com.docker.compose.version": "2.24.6",
+    "org.opencontainers.image.source": "https://github.com/example/shop",
+    "org.opencontainers.image.version": "1.4.2",
+}
+
+
+def full_record(index: int) -> bytes:
+    labels = dict(COMPOSE_LABELS, **{"com.docker.compose.service": f"web{index}"})
+    if index % 4 == 0:
+        labels["proxy.ports"] = "3000,9229"
+    return json.dumps({
+        "Command": "\"docker-entrypoint.sh npm start\"",
+        "CreatedAt": "2024-03-01 12:00:00 +0000 UTC",
+        "ID": f"{index:012x}",
+        "Image": "shop-web",
+        "Labels": ",".join(f"{key}={value}" for key, value in labels.items()),
+        "LocalVolumes": "1",
+        "Mounts": "/home/dev/shop/src,shop_node_modules",
+        "Names": f"shop-web{index}-1",
+        "Networks": "shop_default",
+        "Ports": f"0.0.0.0:{8000 + index}->3000/tcp, :::{8000 + index}->3000/tcp",
+        "RunningFor": "2 hours ago",
+        "Size": "0B",
+        "State": "running",
+        "Status": "Up 2 hours",
+    }).encode()
+
+
+def minimal_record(index: int) -> bytes:
+    # what docker_ps_format makes docker ps print for the same container
+    labels = {"": ""}
+    if index % 4 == 0:
+        labels["proxy.ports"] = "3000,9229"
+    return json.dumps({
+        "ID": f"{index:012x}",
+        "Names": f"shop-web{index}-1",
+        "Ports": f"0.0.0.0:{8000 + index}->3000/tcp, :::{8000 + index}->3000/tcp",
+        "CreatedAt": "2024-03-01 12:00:00 +0000 UTC",
+        "Labels": labels,
+        "LabelNames": list(labels),
+    }, separators=(",", ":")).encode()
+
+
+def measure(lines: list[bytes], repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for _ in parse_containers(iter(lines)):
+            pass
+    return (time.perf_counter() - start) / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the docker ps output formats.")
+    parser.add_argument("--containers", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    for name, record in (("full", full_record), ("minimal", minimal_record)):
+        lines = [record(index) + b"\n" for index in range(args.containers)]
+        size = sum(len(line) for line in lines)
+        elapsed = measure(lines, args.repeat)
+        print(f"{name:<10}{size:>10} bytes {elapsed * 1000:>8.2f} ms per parse")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+import asyncio
+import dataclasses
+import functools
+import statistics
+import time
+from typing import Iterable, Sequence
+from docker_container_proxy import DockerContainer, PortMapping, IPVersion, BaseProxyConfig
+from docker_container_proxy import DashboardServer, HTTPProxy, Generator
+from docker_container_proxy import generate_proxies
+
+RESPONSE_BODY = b"x" * 1024
+# what a slow client reads at a time, pausing in between
+SLOW_READ_SIZE = 16 * 1024
+
+
+async def handle_stub_request(
+    reader: asyncio.StreamReader,
+    writer: asyncio.StreamWriter,
+    body: bytes = RESPONSE_BODY,
+) -> None:
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            for line in head.split(b"\r\n"):
+                if line.lower().startswith(b"content-length:"):
+                    await reader.readexactly(int(line.split(b":", 1)[1]))
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: text/plain\r\n"
+                b"Content-Length: %d\r\n\r\n%s" % (len(body), body)
+            )
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_stub_backends(count: int, body: bytes = RESPONSE_BODY) -> list[asyncio.Server]:
+    return [
+        await asyncio.start_server(
+            functools.partial(handle_stub_request, body=body), "127.0.0.1", 0
+        )
+        for _ in range(count)
+    ]
+
+
+def server_port(server: asyncio.Server) -> int:
+    return int(server.sockets[0].getsockname()[1])
+
+
+def build_proxy(
+    backend_ports: Sequence[int],
+    listen: int,
+    path_prefix: str = "unused",
+) -> HTTPProxy:
+    # the same pipeline as in the script, with containers pointing at the stub backends
+    containers = [
+        DockerContainer(
+            name=f"backend-{index}",
+            ports=(PortMapping(exposed=port, internal=80, ip_version=IPVersion.V4),),
+        )
+        for index, port in enumerate(backend_ports)
+    ]
+    base_config = BaseProxyConfig(listen=listen, proxy_host="127.0.0.1", domain="test")
+    proxy_servers = tuple(generate_proxies(containers, (80,), IPVersion.V4, base_config))
+    dashboard_server = DashboardServer(
+        host_name="_dashboard",
+        domain=base_config.domain,
+        listen=base_config.listen,
+        proxy_servers=proxy_servers,
+    )
+    return HTTPProxy.from_config_generator(
+        base_config,
+        Generator(name=__name__, path_prefix=path_prefix),
+        (dashboard_server,) + proxy_servers,
+    )
+
+
+@dataclasses.dataclass(frozen=True)
+class LoadResult:
+    requests: int
+    errors: int
+    duration: float
+    latencies: tuple[float, ...]
+    # response body bytes as sent, i.e. compressed ones when the proxy compresses
+    body_bytes: int = 0
+
+    @property
+    def rps(self) -> float:
+        return self.requests / self.duration
+
+    def percentile(self, percent: int) -> float:
+        if len(self.latencies) < 2:
+            return self.latencies[0] if self.latencies else 0.0
+        return statistics.quantiles(self.latencies, n=100)[percent - 1]
+
+    def summary(self) -> str:
+        return (
+            f"{self.rps:10.0f} req/s"
+            f"  p50 {self.percentile(50) * 1000:7.2f} ms"
+            f"  p90 {self.percentile(90) * 1000:7.2f} ms"
+            f"  p99 {self.percentile(99) * 1000:7.2f} ms"
+            f"  {self.body_bytes / max(self.requests, 1):8.0f} B/response"
+            f"  errors {self.errors}"
+        )
+
+
+async def read_exactly(reader: asyncio.StreamReader, count: int, pause: float = 0.0) -> None:
+    # with a pause, the stream buffer fills up and the sender has to wait for the reader
+    while count > 0:
+        size = min(count, SLOW_READ_SIZE) if pause else count
+        await reader.readexactly(size)
+        count -= size
+        if pause:
+            await asyncio.sleep(pause)
+
+
+async def read_body(reader: asyncio.StreamReader, head: bytes, pause: float = 0.0) -> int:
+    # returns the size of the body, delimited by either chunked encoding or length
+    headers = {
+        name.strip().lower(): value.strip()
+        for name, _, value in (line.partition(b":") for line in head.split(b"\r\n")[1:])
+    }
+    if b"chunked" in headers.get(b"transfer-encoding", b"").lower():
+        size = 0
+        while True:
+            chunk_size = int((await reader.readuntil(b"\r\n")).split(b";", 1)[0], 16)
+            if chunk_size == 0:
+                break
+            await read_exactly(reader, chunk_size + 2, pause)
+            size += chunk_size
+        # trailer section, terminated by an empty line
+        while await reader.readuntil(b"\r\n") != b"\r\n":
+            pass
+        return size
+    length = int(headers.get(b"content-length", b"0"))
+    await read_exactly(reader, length, pause)
+    return length
+
+
+async def drive_load(  # pylint: disable=too-many-arguments; (one per client behaviour)
+    port: int,
+    host_names: Iterable[str],
+    concurrency: int,
+    duration: float,
+    headers: Sequence[tuple[str, str]] = (),
+    *,
+    read_pause: float = 0.0,
+) -> LoadResult:
+    # every client keeps a single connection alive, cycling through the host names;
+    # with a read pause, clients read SLOW_READ_SIZE bytes of a body at a time
+    host_names = tuple(host_names)
+    extra_headers = "".join(f"{name}: {value}\r\n" for name, value in headers)
+    latencies: list[float] = []
+    errors = 0
+    body_bytes = 0
+    deadline = time.monotonic() + duration
+
+    async def client(index: int) -> None:
+        nonlocal errors, body_bytes
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        requests = 0
+        try:
+            while time.monotonic() < deadline:
+                host_name = host_names[(index + requests) % len(host_names)]
+                requests += 1
+                start = time.perf_counter()
+                writer.write(
+                    f"GET / HTTP/1.1\r\nHost: {host_name}\r\n{extra_headers}\r\n".encode()
+                )
+                head = await reader.readuntil(b"\r\n\r\n")
+                body_bytes += await read_body(reader, head[:-4], read_pause)
+                latencies.append(time.perf_counter() - start)
+                if not head.startswith(b"HTTP/1.1 200 "):
+                    errors += 1
+        except (asyncio.IncompleteReadError, ConnectionError):
+            errors += 1
+        finally:
+            writer.close()
+
+    start = time.monotonic()
+    await asyncio.gather(*(client(index) for index in range(concurrency)))
+    return LoadResult(
+        requests=len(latencies),
+        errors=errors,
+        duration=time.monotonic() - start,
+        latencies=tuple(latencies),
+        body_bytes=body_bytes,
+    )
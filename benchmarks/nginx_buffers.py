@@ -0,0 +1,87 @@
+# How many responses nginx buffers to temporary files with each buffer profile,
+# for responses that the clients read slower than the stub backends send them:
+# the clients read 16k at a time and pause in between. nginx logs a warning for
+# every such response, the generated configuration logs errors only, so the
+# level is lowered to count them.
+#
+# usage: python -m benchmarks.nginx_buffers [--response-size KB] [--concurrency N] [--duration S]
+#                                           [--read-pause S]
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+from typing import Optional
+from docker_container_proxy import HTTPProxyServer, Generator, ProxyTuning, BUFFER_PROFILES
+from docker_container_proxy import NGINX_BINARY
+from .load import LoadResult, build_proxy, drive_load
+from .nginx_load import with_tuning, nginx_available, free_port, stub_backends, running_nginx
+
+PROFILES: tuple[Optional[str], ...] = (None,) + tuple(BUFFER_PROFILES)
+
+
+def count_buffered_responses(error_log_file: str) -> int:
+    try:
+        with open(error_log_file, "r", encoding="utf-8", errors="replace") as error_log:
+            return sum("buffered to a temporary file" in line for line in error_log)
+    except FileNotFoundError:
+        return 0
+
+
+def run(
+    response_size: int,
+    concurrency: int,
+    duration: float,
+    backend_count: int = 2,
+    read_pause: float = 0.005,
+) -> dict[str, tuple[LoadResult, int]]:
+    results = {}
+    with stub_backends(backend_count, b"x" * response_size) as backend_ports, \
+            tempfile.TemporaryDirectory() as path:
+        generator = Generator(name=__name__, path_prefix=path)
+        for profile in PROFILES:
+            proxy = with_tuning(ProxyTuning(buffers=profile))(
+                build_proxy(backend_ports, free_port(), path)
+            )
+            config = proxy.config().replace(
+                f"error_log {proxy.error_log_file};",
+                f"error_log {proxy.error_log_file} warn;",
+            )
+            if os.path.exists(proxy.error_log_file):
+                os.unlink(proxy.error_log_file)
+            host_names = [
+                server.server_name for server in proxy.servers
+                if isinstance(server, HTTPProxyServer)
+            ]
+            with running_nginx(proxy, generator, config):
+                result = asyncio.run(drive_load(
+                    proxy.listen, host_names, concurrency, duration, read_pause=read_pause,
+                ))
+            results[profile or "default"] = (result, count_buffered_responses(proxy.error_log_file))
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Count responses buffered to disk by nginx.")
+    parser.add_argument("--response-size", type=int, default=512, metavar="KB")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument(
+        "--read-pause", type=float, default=0.005, metavar="S",
+        help="pause of the clients after reading 16k of a response, 0 reads at full speed",
+    )
+    args = parser.parse_args()
+    if not nginx_available():
+        print(f"skipping, {NGINX_BINARY} is not installed")
+        sys.exit(0)
+    results = run(
+        args.response_size * 1024, args.concurrency, args.duration, read_pause=args.read_pause,
+    )
+    for profile, (result, buffered) in results.items():
+        share = buffered / result.requests * 100 if result.requests else 0.0
+        print(f"{profile:<10}{result.summary()}  buffered to disk {buffered} ({share:.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
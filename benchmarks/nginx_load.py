@@ -0,0 +1,162 @@
+# Load test of the generated nginx configuration, comparing configuration
+# variants against the same set of stub backends. The stub backends run in a
+# separate process, so that they don't compete with the load generator.
+#
+# usage: python -m benchmarks.nginx_load [--backends N] [--concurrency N] [--duration S]
+
+import argparse
+import asyncio
+import contextlib
+import dataclasses
+import multiprocessing
+import multiprocessing.connection
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Iterator, Optional, Sequence
+from docker_container_proxy import HTTPProxyServer, HTTPProxy, Generator, ProxyTuning
+from docker_container_proxy import NGINX_BINARY
+from .load import LoadResult, start_stub_backends, server_port, build_proxy, drive_load
+from .load import RESPONSE_BODY
+
+
+def with_tuning(tuning: ProxyTuning) -> Callable[[HTTPProxy], HTTPProxy]:
+
+    def apply(proxy: HTTPProxy) -> HTTPProxy:
+        servers = tuple(
+            dataclasses.replace(server, tuning=tuning)
+            if isinstance(server, HTTPProxyServer) else server
+            for server in proxy.servers
+        )
+        return dataclasses.replace(proxy, servers=servers)
+
+    return apply
+
+
+VARIANTS: dict[str, Callable[[HTTPProxy], HTTPProxy]] = {
+    "default": lambda proxy: proxy,
+    "buffering-off": with_tuning(ProxyTuning(buffering=False)),
+    "gzip": with_tuning(ProxyTuning(gzip=True)),
+}
+
+# sent by the load generator with a variant, nginx only compresses for clients
+# that accept it
+REQUEST_HEADERS: dict[str, tuple[tuple[str, str], ...]] = {
+    "gzip": (("Accept-Encoding", "gzip"),),
+}
+
+
+def nginx_available() -> bool:
+    return os.access(NGINX_BINARY, os.X_OK)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return int(sock.getsockname()[1])
+
+
+def serve_stub_backends(
+    count: int,
+    connection: multiprocessing.connection.Connection,
+    body: bytes,
+) -> None:
+
+    async def serve() -> None:
+        backends = await start_stub_backends(count, body)
+        connection.send([server_port(backend) for backend in backends])
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+
+@contextlib.contextmanager
+def stub_backends(count: int, body: bytes = RESPONSE_BODY) -> Iterator[list[int]]:
+    parent_connection, child_connection = multiprocessing.Pipe()
+    process = multiprocessing.Process(
+        target=serve_stub_backends,
+        args=(count, child_connection, body),
+        daemon=True,
+    )
+    process.start()
+    try:
+        yield parent_connection.recv()
+    finally:
+        process.terminate()
+        process.join()
+
+
+@contextlib.contextmanager
+def running_nginx(
+    proxy: HTTPProxy,
+    generator: Generator,
+    config: Optional[str] = None,
+) -> Iterator[None]:
+    config_filename = generator.write(config or proxy.config())
+    process = subprocess.Popen(  # pylint: disable=consider-using-with
+        [NGINX_BINARY, "-c", config_filename, "-e", proxy.error_log_file, "-g", "daemon off;"],
+    )
+    try:
+        wait_for_port(proxy.listen, process)
+        yield
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def wait_for_port(port: int, process: subprocess.Popen[bytes], timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"nginx exited with code {process.returncode}")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"nginx is not listening on port {port} after {timeout}s")
+
+
+def run(
+    backend_count: int,
+    concurrency: int,
+    duration: float,
+    variants: Optional[Sequence[str]] = None,
+) -> dict[str, LoadResult]:
+    results = {}
+    with stub_backends(backend_count) as backend_ports, tempfile.TemporaryDirectory() as path:
+        generator = Generator(name=__name__, path_prefix=path)
+        for variant in variants or VARIANTS:
+            proxy = VARIANTS[variant](build_proxy(backend_ports, free_port(), path))
+            host_names = [
+                server.server_name for server in proxy.servers
+                if isinstance(server, HTTPProxyServer)
+            ]
+            with running_nginx(proxy, generator):
+                results[variant] = asyncio.run(drive_load(
+                    proxy.listen, host_names, concurrency, duration,
+                    REQUEST_HEADERS.get(variant, ()),
+                ))
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test generated nginx configurations.")
+    parser.add_argument("--backends", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--variant", dest="variants", action="append", choices=VARIANTS)
+    args = parser.parse_args()
+    if not nginx_available():
+        print(f"skipping, {NGINX_BINARY} is not installed")
+        sys.exit(0)
+    results = run(args.backends, args.concurrency, args.duration, args.variants)
+    for variant, result in results.items():
+        print(f"{variant:<16}{result.summary()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,31 @@
 #!/usr/bin/env python3
 
 from __future__ import annotations
+import asyncio
+import bisect
+import contextlib
 import dataclasses
 import enum
+import functools
+import hashlib
+import http.client
+import ipaddress
 import json
 import os
 import os.path
 import re
+import signal
 import string
+import struct
 import subprocess
 import sys
 import textwrap
+import threading
+import time
 import argparse
-from typing import Iterable, Optional
+import concurrent.futures
+from typing import Any, AsyncIterator, Callable, Iterable, Iterator, Mapping, Optional, Protocol
+from typing import Sequence, Union, cast
 
 
 @enum.unique
@@ -32,6 +45,13 @@ class PortMapping:
 class DockerContainer:
     name: str
     ports: tuple[PortMapping, ...]
+    labels: tuple[tuple[str, str], ...] = ()
+    # host on which the exposed ports are reachable, None for the proxy host
+    proxied_host: Optional[str] = None
+    container_id: str = ""
+    created_at: str = ""
+    # tells apart containers with the same name on different Docker endpoints
+    qualifier: str = ""
 
     def __post_init__(self) -> None:
         # multiple names and fancy characters not supported because that would
@@ -39,26 +59,189 @@ class DockerContainer:
         if not re.fullmatch(r"^[-_a-z0-9]+$", self.name):
             raise ValueError(f"unsupported characters in container name: {self.name}")
 
+    @property
+    def qualified_name(self) -> str:
+        return f"{self.name}-{self.qualifier}" if self.qualifier else self.name
+
+    @functools.cached_property
+    def port_index(self) -> dict[tuple[int, IPVersion], tuple[int, ...]]:
+        index: dict[tuple[int, IPVersion], tuple[int, ...]] = {}
+        for port_mapping in self.ports:
+            key = (port_mapping.internal, port_mapping.ip_version)
+            index[key] = index.get(key, ()) + (port_mapping.exposed,)
+        return index
+
     def pick_exposed_port(self, internal_port: int, ip_version: IPVersion) -> Optional[int]:
-        port_mappings = tuple(filter(
-            lambda pm: pm.internal == internal_port and pm.ip_version == ip_version,
-            self.ports,
-        ))
-        return port_mappings[0].exposed if len(port_mappings) == 1 else None
+        exposed_ports = self.port_index.get((internal_port, ip_version), ())
+        return exposed_ports[0] if len(exposed_ports) == 1 else None
+
 
+@dataclasses.dataclass(frozen=True)
+class DockerEndpoint:
+    # Docker context name or daemon URL, None for the default one
+    address: Optional[str] = None
+    proxied_host: Optional[str] = None
 
-def list_containers() -> Iterable[DockerContainer]:
-    process = subprocess.run(["docker", "ps", "--format=json"], capture_output=True, check=True)
-    return parse_containers(process.stdout)
+    @staticmethod
+    def from_cli_arg(arg: str) -> DockerEndpoint:
+        address, _, proxied_host = arg.partition("=")
+        if not address:
+            raise ValueError(f"missing Docker context or URL in endpoint: {arg}")
+        return DockerEndpoint(address=address, proxied_host=proxied_host or None)
 
+    @property
+    def name(self) -> str:
+        return self.address or "default"
 
-def parse_containers(docker_ps_output: bytes) -> Iterable[DockerContainer]:
-    for line in docker_ps_output.splitlines():
-        data = json.loads(line)
-        yield DockerContainer(
-            name=data["Names"],
-            ports=tuple(parse_port_mappings(data["Ports"])),
+    @property
+    def qualifier(self) -> str:
+        # the name without URL scheme, with only characters allowed in container names
+        return re.sub(r"[^a-z0-9]+", "-", self.name.rpartition("://")[2].lower()).strip("-")
+
+    def docker_command(self) -> list[str]:
+        if self.address is None:
+            return ["docker"]
+        if "://" in self.address:
+            return ["docker", "--host", self.address]
+        return ["docker", "--context", self.address]
+
+    def list_containers(
+        self,
+        timeout: Optional[float] = None,
+        cache: Optional[GenerationCache] = None,
+    ) -> tuple[DockerContainer, ...]:
+        command = self.docker_command() + ["ps", "--format", docker_ps_format()]
+        with subprocess.Popen(
+            command, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        ) as process:
+            # the timer kills a hung docker client, the read loop then ends with EOF
+            expired = threading.Event()
+
+            def expire() -> None:
+                expired.set()
+                process.kill()
+
+            timer = threading.Timer(timeout, expire) if timeout is not None else None
+            if timer:
+                timer.start()
+            try:
+                assert process.stdout is not None
+                containers = tuple(
+                    dataclasses.replace(container, proxied_host=self.proxied_host)
+                    for container in parse_containers(process.stdout, cache)
+                )
+                _, stderr = process.communicate()
+            except ValueError:
+                # a line cut short by the timer
+                if not expired.is_set():
+                    raise
+                containers, stderr = (), b""
+            finally:
+                if timer:
+                    timer.cancel()
+            if expired.is_set():
+                raise subprocess.TimeoutExpired(command, timeout or 0, stderr=stderr)
+            if process.returncode != 0:
+                raise subprocess.CalledProcessError(process.returncode, command, stderr=stderr)
+        return containers
+
+
+def docker_ps_format() -> str:
+    # a JSON object with only the fields parse_container reads, instead of the
+    # full --format=json record; label values are requested by name so that
+    # unrelated ones (Compose adds about a dozen per container) are never sent,
+    # only the names of all proxy.* labels, so that misspelled ones are reported
+    labels = "".join(
+        f'{{{{with .Label "{label}"}}}},"{label}":{{{{json .}}}}{{{{end}}}}'
+        for label in ProxyTuning.label_names()
+    )
+    prefix = ProxyTuning.LABEL_PREFIX
+    label_names = (
+        '{{range split .Labels ","}}{{$name := index (split . "=") 0}}'
+        '{{if ge (len $name) ' + str(len(prefix)) + '}}'
+        '{{if eq (slice $name 0 ' + str(len(prefix)) + ') "' + prefix + '"}}'
+        ',{{json $name}}{{end}}{{end}}{{end}}'
+    )
+    return (
+        '{"ID":{{json .ID}},"Names":{{json .Names}},"Ports":{{json .Ports}},'
+        '"CreatedAt":{{json .CreatedAt}},"Labels":{"":""' + labels + '},'
+        '"LabelNames":[""' + label_names + "]}"
+    )
+
+
+def list_containers(
+    endpoints: Sequence[DockerEndpoint] = (DockerEndpoint(),),
+    timeout: Optional[float] = None,
+    cache: Optional[GenerationCache] = None,
+) -> Iterable[DockerContainer]:
+    # a failing or slow endpoint is skipped so that it doesn't block the others,
+    # unless there's nothing left to list containers from
+    if cache:
+        cache.reset()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, len(endpoints))) as executor:
+        futures = [
+            executor.submit(endpoint.list_containers, timeout, cache) for endpoint in endpoints
+        ]
+    errors: list[Exception] = []
+    containers: list[DockerContainer] = []
+    # a name already used on a previous endpoint is qualified with the endpoint, so
+    # that each container gets a host name of its own
+    names: set[str] = set()
+    for endpoint, future in zip(endpoints, futures, strict=True):
+        try:
+            endpoint_containers = future.result()
+        except (subprocess.SubprocessError, OSError) as error:
+            print(f"skipping Docker endpoint {endpoint.name}: {error}", file=sys.stderr)
+            errors.append(error)
+            continue
+        containers += (
+            dataclasses.replace(container, qualifier=endpoint.qualifier)
+            if container.name in names else container
+            for container in endpoint_containers
         )
+        names.update(container.name for container in endpoint_containers)
+    if errors and len(errors) == len(endpoints):
+        raise errors[0]
+    return containers
+
+
+def parse_containers(
+    docker_ps_output: Union[bytes, Iterable[bytes]],
+    cache: Optional[GenerationCache] = None,
+) -> Iterable[DockerContainer]:
+    # either the whole output or a stream of lines, e.g. a pipe from docker ps
+    lines = (
+        docker_ps_output.splitlines()
+        if isinstance(docker_ps_output, bytes)
+        else docker_ps_output
+    )
+    for raw_line in lines:
+        line = raw_line.strip()
+        if not line:
+            continue
+        cached_container = cache.container(line) if cache else None
+        if cached_container is not None:
+            yield cached_container
+            continue
+        container = parse_container(line)
+        if cache:
+            cache.add_container(line, container)
+        yield container
+
+
+def parse_container(line: bytes) -> DockerContainer:
+    data = json.loads(line)
+    labels = data.get("Labels", "")
+    if "LabelNames" in data:
+        # the values of unknown labels are not requested, they are rejected anyway
+        labels = dict.fromkeys(data["LabelNames"], "") | labels
+    return DockerContainer(
+        name=data["Names"],
+        ports=tuple(parse_port_mappings(data["Ports"])),
+        labels=tuple(parse_labels(labels)),
+        container_id=data.get("ID", ""),
+        created_at=data.get("CreatedAt", ""),
+    )
 
 
 def parse_port_mappings(ports: str) -> Iterable[PortMapping]:
@@ -85,15 +268,278 @@ def parse_port_mappings(ports: str) -> Iterable[PortMapping]:
         yield PortMapping(exposed=exposed, internal=internal, ip_version=ip_version)
 
 
+def parse_labels(labels: Union[str, Mapping[str, str]]) -> Iterable[tuple[str, str]]:
+    # only the labels meant for this script are kept, see ProxyTuning; a string
+    # comes from --format=json, a mapping from docker_ps_format
+    if isinstance(labels, str):
+        labels = parse_joined_labels(labels)
+    for key, value in sorted(labels.items()):
+        if not key.startswith(ProxyTuning.LABEL_PREFIX):
+            continue
+        yield key, value
+
+
+def parse_joined_labels(labels: str) -> dict[str, str]:
+    # docker ps joins labels with commas without escaping them, a chunk without =
+    # is taken as the rest of a value with commas, e.g. proxy.ports=3000,9229
+    pairs: dict[str, str] = {}
+    key = None
+    for chunk in labels.split(","):
+        name, separator, value = chunk.partition("=")
+        if separator:
+            key = name.strip()
+            pairs[key] = value.strip()
+        elif key is not None:
+            pairs[key] += "," + chunk.strip()
+    return pairs
+
+
 class PortConflictError(Exception):
     pass
 
 
+class InvalidLabelError(Exception):
+    pass
+
+
+@dataclasses.dataclass(frozen=True)
+class ProxyTuning:  # pylint: disable=too-many-instance-attributes; (one per label)
+    LABEL_PREFIX = "proxy."
+
+    buffering: Optional[bool] = None
+    websocket: bool = False
+    gzip: bool = False
+    read_timeout: Optional[str] = None
+    send_timeout: Optional[str] = None
+    client_max_body_size: Optional[str] = None
+    # internal ports to proxy, each one with a separate server
+    ports: tuple[int, ...] = ()
+    rate_limit: Optional[str] = None
+    burst: Optional[int] = None
+    connection_limit: Optional[int] = None
+    connect_timeout: Optional[str] = None
+    # conditions for trying the next address of the proxied host, e.g. IPv4 after IPv6
+    next_upstream: Optional[str] = None
+    # a page naming the container instead of the nginx one when it doesn't respond
+    error_page: bool = False
+    # one of BUFFER_PROFILES
+    buffers: Optional[str] = None
+
+    @staticmethod
+    def from_labels(
+        labels: Mapping[str, str],
+        defaults: Optional[ProxyTuning] = None,
+    ) -> ProxyTuning:
+        known_labels = {
+            "buffering": parse_switch,
+            "websocket": parse_switch,
+            "gzip": parse_switch,
+            "read_timeout": parse_time,
+            "send_timeout": parse_time,
+            "client_max_body_size": parse_size,
+            "ports": parse_ports,
+            "rate_limit": parse_rate,
+            "burst": parse_count,
+            "connection_limit": parse_count,
+            "connect_timeout": parse_time,
+            "next_upstream": parse_next_upstream,
+            "error_page": parse_switch,
+            "buffers": parse_buffer_profile,
+        }
+        values: dict[str, Any] = {}
+        for label, value in labels.items():
+            if not label.startswith(ProxyTuning.LABEL_PREFIX):
+                continue
+            key = label[len(ProxyTuning.LABEL_PREFIX):]
+            if key not in known_labels:
+                raise InvalidLabelError(f"unknown label {label}")
+            try:
+                values[key] = known_labels[key](value)
+            except ValueError as value_error:
+                raise InvalidLabelError(f"label {label}: {value_error}") from value_error
+        return dataclasses.replace(defaults or ProxyTuning(), **values)
+
+    @staticmethod
+    def label_names() -> tuple[str, ...]:
+        # every field is set with a label of the same name
+        return tuple(
+            ProxyTuning.LABEL_PREFIX + field.name for field in dataclasses.fields(ProxyTuning)
+        )
+
+    def directives(self) -> tuple[str, ...]:
+        directives: list[str] = []
+        if self.buffering is not None:
+            directives.append("proxy_buffering " + ("on" if self.buffering else "off"))
+        if self.websocket:
+            directives += [
+                "proxy_http_version 1.1",
+                "proxy_set_header Upgrade $http_upgrade",
+                "proxy_set_header Connection $http_connection",
+            ]
+        if self.gzip:
+            directives += [
+                "gzip on",
+                "gzip_proxied any",
+                "gzip_types application/json application/javascript text/css text/plain text/xml",
+            ]
+        if self.connect_timeout is not None:
+            directives.append(f"proxy_connect_timeout {self.connect_timeout}")
+        if self.read_timeout is not None:
+            directives.append(f"proxy_read_timeout {self.read_timeout}")
+        if self.send_timeout is not None:
+            directives.append(f"proxy_send_timeout {self.send_timeout}")
+        if self.client_max_body_size is not None:
+            directives.append(f"client_max_body_size {self.client_max_body_size}")
+        if self.next_upstream is not None:
+            directives.append(f"proxy_next_upstream {self.next_upstream}")
+        if self.buffers is not None:
+            directives += BUFFER_PROFILES[self.buffers]
+        if self.rate_limit is not None:
+            burst = f" burst={self.burst} nodelay" if self.burst else ""
+            directives.append(f"limit_req zone={rate_limit_zone_name(self.rate_limit)}{burst}")
+        if self.connection_limit is not None:
+            directives.append(f"limit_conn {CONNECTION_LIMIT_ZONE_NAME} {self.connection_limit}")
+        return tuple(directives)
+
+
+CONNECTION_LIMIT_ZONE_NAME = "connections_per_server"
+
+
+def rate_limit_zone_name(rate: str) -> str:
+    # the rate is a property of the zone, so there's one zone for every rate in use
+    return "requests_per_server_" + rate.replace("/", "_")
+
+
+def limit_zone_directives(tunings: Iterable[ProxyTuning]) -> list[str]:
+    # limits apply to servers as a whole, not to clients, hence the $server_name key;
+    # a zone state takes less than 128 bytes, nginx requires at least 32k
+    tunings = tuple(tunings)
+
+    def zone_size(servers: int) -> str:
+        return f"{max(32, -(-servers * 128 // 1024))}k"
+
+    rates = [tuning.rate_limit for tuning in tunings if tuning.rate_limit is not None]
+    connection_limits = [tuning for tuning in tunings if tuning.connection_limit is not None]
+    directives = [
+        f"limit_req_zone $server_name"
+        f" zone={rate_limit_zone_name(rate)}:{zone_size(rates.count(rate))} rate={rate};"
+        for rate in dict.fromkeys(rates)
+    ]
+    if connection_limits:
+        directives.append(
+            f"limit_conn_zone $server_name"
+            f" zone={CONNECTION_LIMIT_ZONE_NAME}:{zone_size(len(connection_limits))};"
+        )
+    if directives:
+        directives += [
+            "limit_req_status 429;",
+            "limit_conn_status 503;",
+            "log_format limits '$remote_addr - $remote_user [$time_local] \"$request\" $status"
+            " $body_bytes_sent \"$http_referer\" \"$http_user_agent\" $server_name"
+            " limit_req=$limit_req_status limit_conn=$limit_conn_status';",
+        ]
+    return directives
+
+
+def parse_switch(value: str) -> bool:
+    switches = {"on": True, "true": True, "1": True, "off": False, "false": False, "0": False}
+    if value.lower() not in switches:
+        raise ValueError(f"expected on or off, got {value!r}")
+    return switches[value.lower()]
+
+
+def parse_time(value: str) -> str:
+    if not re.fullmatch(r"^[1-9][0-9]*(ms|s|m|h)?$", value):
+        raise ValueError(f"expected a nginx time value like 30s or 5m, got {value!r}")
+    return value
+
+
+def time_seconds(value: str) -> float:
+    # of a value accepted by parse_time, nginx takes a number without unit as seconds
+    match = re.fullmatch(r"([0-9]+)(ms|s|m|h)?", parse_time(value))
+    assert match is not None
+    return int(match.group(1)) * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[match.group(2) or "s"]
+
+
+NEXT_UPSTREAM_CONDITIONS = (
+    "error", "timeout", "invalid_header", "http_500", "http_502", "http_503", "http_504",
+    "http_403", "http_404", "http_429", "non_idempotent", "off",
+)
+
+
+# Buffer sizes for a kind of traffic. nginx keeps 32k or 64k of a response in
+# memory by default, the rest of a response that the client doesn't read fast
+# enough goes to a temporary file. The busy buffers have to be smaller than all
+# the buffers but one.
+BUFFER_PROFILES: dict[str, tuple[str, ...]] = {
+    # JSON responses and request bodies up to a couple hundred kilobytes
+    "api": (
+        "proxy_buffer_size 16k",
+        "proxy_buffers 16 16k",
+        "proxy_busy_buffers_size 32k",
+        "client_body_buffer_size 128k",
+    ),
+    # scripts, stylesheets and images up to a few megabytes, small request bodies
+    "assets": (
+        "proxy_buffer_size 16k",
+        "proxy_buffers 64 64k",
+        "proxy_busy_buffers_size 256k",
+        "client_body_buffer_size 16k",
+    ),
+}
+
+
+def parse_buffer_profile(value: str) -> str:
+    if value not in BUFFER_PROFILES:
+        raise ValueError(f"expected one of {', '.join(BUFFER_PROFILES)}, got {value!r}")
+    return value
+
+
+def parse_next_upstream(value: str) -> str:
+    conditions = value.replace(",", " ").split()
+    unknown = [condition for condition in conditions if condition not in NEXT_UPSTREAM_CONDITIONS]
+    if not conditions or unknown:
+        raise ValueError(
+            f"expected proxy_next_upstream conditions like error timeout, got {value!r}"
+        )
+    if "off" in conditions and len(conditions) > 1:
+        raise ValueError(f"off can't be combined with other conditions, got {value!r}")
+    return " ".join(conditions)
+
+
+def parse_ports(value: str) -> tuple[int, ...]:
+    if not re.fullmatch(r"^[0-9]+(,[0-9]+)*$", value):
+        raise ValueError(f"expected a comma separated list of port numbers, got {value!r}")
+    ports = tuple(int(port) for port in value.split(","))
+    if not all(0 < port < 65536 for port in ports) or len(set(ports)) != len(ports):
+        raise ValueError(f"expected distinct port numbers, got {value!r}")
+    return ports
+
+
+def parse_rate(value: str) -> str:
+    if not re.fullmatch(r"^[1-9][0-9]*r/[sm]$", value):
+        raise ValueError(f"expected a nginx rate like 10r/s or 600r/m, got {value!r}")
+    return value
+
+
+def parse_count(value: str) -> int:
+    if not re.fullmatch(r"^[1-9][0-9]*$", value):
+        raise ValueError(f"expected a positive number, got {value!r}")
+    return int(value)
+
+
+def parse_size(value: str) -> str:
+    if not re.fullmatch(r"^[0-9]+[kKmMgG]?$", value):
+        raise ValueError(f"expected a nginx size value like 512k or 100m, got {value!r}")
+    return value
+
+
 @dataclasses.dataclass(frozen=True)
 class Server:
     host_name: str
     domain: str
     listen: int
+    tls_listen: Optional[int] = dataclasses.field(default=None, kw_only=True)
 
     @property
     def server_name(self) -> str:
@@ -101,7 +547,20 @@ class Server:
 
     @property
     def url(self) -> str:
-        return f"http://{self.server_name}:{self.listen}/"
+        return self.url_for(self.host_name)
+
+    def url_for(self, host_name: str) -> str:
+        # of a server with the same domain and ports
+        server_name = host_name + "." + self.domain
+        if self.tls_listen is not None:
+            return f"https://{server_name}:{self.tls_listen}/"
+        return f"http://{server_name}:{self.listen}/"
+
+    def listen_directives(self) -> str:
+        directives = [f"listen {self.listen};"]
+        if self.tls_listen is not None:
+            directives.append(f"listen {self.tls_listen} ssl http2;")
+        return "\n    ".join(directives)
 
     @property
     def info(self) -> str:
@@ -110,6 +569,9 @@ class Server:
     def config(self) -> str:
         raise NotImplementedError
 
+    def summary(self) -> dict[str, Any]:
+        return {"info": self.info, "server_name": self.server_name, "url": self.url}
+
     def compare(self, other: Server) -> Optional[str]:
         if self.server_name == other.server_name:
             return f"server name {self.server_name}"
@@ -118,16 +580,20 @@ class Server:
 
 @dataclasses.dataclass(frozen=True)
 class HTTPProxyServer(Server):
+    ERROR_PAGE_URI = "/_docker_container_proxy_error"
+
     proxied_host: str
     proxied_port: int
     docker_container: DockerContainer
+    tuning: ProxyTuning = ProxyTuning()
 
     def __post_init__(self) -> None:
-        if self.proxied_port == self.listen:
-            raise PortConflictError(
-                f"proxy with server name {self.server_name}"
-                f" can't listen on port {self.listen} because it conflicts with the proxied port"
-            )
+        for listen in (self.listen, self.tls_listen):
+            if self.proxied_port == listen:
+                raise PortConflictError(
+                    f"proxy with server name {self.server_name}"
+                    f" can't listen on port {listen} because it conflicts with the proxied port"
+                )
 
     @property
     def info(self) -> str:
@@ -136,33 +602,84 @@ class HTTPProxyServer(Server):
     def config(self) -> str:
         template = string.Template("""\
 server {
-    listen $listen;
+    $listen_directives
     server_name $server_name;
     location / {
-        proxy_pass http://$proxied_host:$proxied_port;
+        $directives
     }
-}
+$error_location}
 """)
-        return template.substitute(dataclasses.asdict(self), server_name=self.server_name)
+        directives = (
+            f"proxy_pass http://{self.proxied_host}:{self.proxied_port}",
+        ) + self.tuning.directives()
+        error_location = ""
+        if self.tuning.error_page:
+            directives += (f"error_page 502 504 {self.ERROR_PAGE_URI}",)
+            error_location = string.Template("""\
+    location = $uri {
+        internal;
+        default_type text/html;
+        return 502 '$html';
+    }
+""").substitute(uri=self.ERROR_PAGE_URI, html=self.error_html())
+        return template.substitute(
+            listen_directives=self.listen_directives(),
+            server_name=self.server_name,
+            directives="\n        ".join(directive + ";" for directive in directives),
+            error_location=error_location,
+        )
+
+    def error_html(self) -> str:
+        # served by nginx itself when the container refuses connections or times out,
+        # the status code of the error is kept
+        title = f"Docker container {self.docker_container.name} is not responding"
+        return (
+            "<!DOCTYPE html>"
+            "<html lang=\"en\">"
+            f"<head><title>{title}</title></head>"
+            "<body>"
+            f"<h1>{title}</h1>"
+            f"<p>It was expected on {self.proxied_host} port {self.proxied_port}."
+            " It may have been stopped since the proxy configuration was generated.</p>"
+            f"<p><a href=\"{self.url_for(DashboardServer.HOST_NAME)}\">proxied containers</a></p>"
+            "</body>"
+            "</html>"
+        )
+
+    def summary(self) -> dict[str, Any]:
+        return super().summary() | {
+            "container": self.docker_container.name,
+            "container_id": self.docker_container.container_id,
+            "proxied_host": self.proxied_host,
+            "proxied_port": self.proxied_port,
+        }
 
     def compare(self, other: Server) -> Optional[str]:
         reason = super().compare(other)
         if reason is not None:
             return reason
-        if isinstance(other, HTTPProxyServer) and self.proxied_port == other.proxied_port:
-            return f"proxied port {self.proxied_port}"
+        if isinstance(other, HTTPProxyServer) and (self.proxied_host, self.proxied_port) == (
+            other.proxied_host, other.proxied_port,
+        ):
+            return f"proxied address {self.proxied_host}:{self.proxied_port}"
         return None
 
 
 @dataclasses.dataclass(frozen=True)
 class DashboardServer(Server):
+    HOST_NAME = "_dashboard"
+
     proxy_servers: tuple[HTTPProxyServer, ...]
+    # tells the configurations apart when checking whether a reload took effect
+    generation: str = ""
+    # regenerations per convergence time bucket, see ConvergenceLog
+    convergence: tuple[tuple[str, int], ...] = ()
 
     @property
     def info(self) -> str:
         return "dashboard"
 
-    def config(self) -> str:
+    def html(self) -> str:
         title = "hosts proxied for Docker containers"
 
         def server_html(server: HTTPProxyServer) -> str:
@@ -174,38 +691,59 @@ class DashboardServer(Server):
                 "</tr>"
             )
 
-        def html(proxy_servers: tuple[HTTPProxyServer, ...]) -> str:
-            header_html = (
-                "<!DOCTYPE html>"
-                "<html lang=\"en\">"
-                "<head>"
-                f"<title>{title}</title>"
-                "<style>"
-                "table { width: 80%; margin: auto; }"
-                " td, th { border-spacing: 0; border-bottom-style: solid; border-width: 1px; }"
-                " th { border-top-style: solid; }"
-                " td, th { padding: 0.5ex; }"
-                "</style>"
-                "</head>"
-                "<body>"
-                "<table>"
-                f"<caption>{title}</caption>"
-                "<thead>"
-                "<tr><th>host</th><th>Docker container</th><th>URL</th></tr>"
-                "</thead>"
-                "<tbody>"
-            )
-            footer_html = (
-                "</tbody>"
-                "</table>"
-                "</body>"
-                "</html>"
+        header_html = (
+            "<!DOCTYPE html>"
+            "<html lang=\"en\">"
+            "<head>"
+            f"<title>{title}</title>"
+            "<style>"
+            "table { width: 80%; margin: auto; }"
+            " td, th { border-spacing: 0; border-bottom-style: solid; border-width: 1px; }"
+            " th { border-top-style: solid; }"
+            " td, th { padding: 0.5ex; }"
+            "</style>"
+            "</head>"
+            "<body>"
+            "<table>"
+            f"<caption>{title}</caption>"
+            "<thead>"
+            "<tr><th>host</th><th>Docker container</th><th>URL</th></tr>"
+            "</thead>"
+            "<tbody>"
+        )
+        if self.generation:
+            header_html = header_html.replace(
+                "<head>", f"<head><meta name=\"generation\" content=\"{self.generation}\">"
             )
-            return header_html + "".join(map(server_html, proxy_servers)) + footer_html
+        footer_html = (
+            "</tbody>"
+            "</table>"
+            + self.convergence_html()
+            + "</body>"
+            "</html>"
+        )
+        return header_html + "".join(map(server_html, self.proxy_servers)) + footer_html
+
+    def convergence_html(self) -> str:
+        if not self.convergence:
+            return ""
+        most = max(count for _, count in self.convergence) or 1
+        rows = "".join(
+            f"<tr><td>{bucket}</td><td>{count}</td><td>{'#' * (count * 40 // most)}</td></tr>"
+            for bucket, count in self.convergence
+        )
+        return (
+            "<table>"
+            "<caption>time from listing containers to a live route</caption>"
+            "<thead><tr><th>seconds</th><th>regenerations</th><th></th></tr></thead>"
+            f"<tbody>{rows}</tbody>"
+            "</table>"
+        )
 
+    def config(self) -> str:
         template = string.Template("""\
 server {
-    listen $listen;
+    $listen_directives
     server_name $server_name;
     location / {
         add_header Content-Type text/html;
@@ -214,9 +752,9 @@ server {
 }
 """)
         return template.substitute(
-            listen=self.listen,
+            listen_directives=self.listen_directives(),
             server_name=self.server_name,
-            html=html(self.proxy_servers),
+            html=self.html(),
         )
 
 
@@ -225,6 +763,9 @@ class BaseProxyConfig:
     listen: int
     proxy_host: str
     domain: str
+    tls_listen: Optional[int] = None
+    # applied to all containers, unless overridden by labels
+    default_tuning: ProxyTuning = ProxyTuning()
 
     @staticmethod
     def from_cli_args(args: argparse.Namespace) -> BaseProxyConfig:
@@ -232,34 +773,74 @@ class BaseProxyConfig:
             listen=int(args.port),
             proxy_host=args.host,
             domain=args.domain,
+            tls_listen=args.tls_port,
+            default_tuning=ProxyTuning(
+                rate_limit=args.rate_limit,
+                burst=args.burst,
+                connection_limit=args.connection_limit,
+                connect_timeout=args.connect_timeout,
+                read_timeout=args.read_timeout,
+                next_upstream=args.next_upstream,
+                error_page=args.error_page,
+                buffers=args.buffers,
+            ),
         )
 
 
 def generate_proxies(
     containers: Iterable[DockerContainer],
-    container_internal_port: int,
+    container_internal_ports: Sequence[int],
     ip_version: IPVersion,
     base_config: BaseProxyConfig,
 ) -> Iterable[HTTPProxyServer]:
     for container in containers:
-        exposed_port = container.pick_exposed_port(container_internal_port, ip_version)
+        try:
+            tuning = ProxyTuning.from_labels(dict(container.labels), base_config.default_tuning)
+        except InvalidLabelError as invalid_label_error:
+            raise InvalidLabelError(
+                f"container {container.name} has an invalid label: {invalid_label_error}"
+            ) from invalid_label_error
+        for index, (internal_port, exposed_port) in enumerate(
+            pick_proxied_ports(container, tuning, container_internal_ports, ip_version)
+        ):
+            # the first port gets the container name, the other ones are told apart by number
+            host_name = container.qualified_name
+            if index > 0:
+                host_name += f"-{internal_port}"
+            try:
+                server = HTTPProxyServer(
+                    host_name=host_name,
+                    domain=base_config.domain,
+                    listen=base_config.listen,
+                    tls_listen=base_config.tls_listen,
+                    proxied_host=container.proxied_host or base_config.proxy_host,
+                    proxied_port=exposed_port,
+                    docker_container=container,
+                    tuning=tuning,
+                )
+            except PortConflictError as port_conflict_error:
+                raise PortConflictError(
+                    f"port {exposed_port} exposed by container {container.name}"
+                    " conflicts with proxy configuration"
+                ) from port_conflict_error
+            yield server
+
+
+def pick_proxied_ports(
+    container: DockerContainer,
+    tuning: ProxyTuning,
+    container_internal_ports: Sequence[int],
+    ip_version: IPVersion,
+) -> Iterable[tuple[int, int]]:
+    # all the ports listed in the container's label, otherwise the preferred one
+    candidates = tuning.ports or container_internal_ports
+    for internal_port in candidates:
+        exposed_port = container.pick_exposed_port(internal_port, ip_version)
         if exposed_port is None:
             continue
-        try:
-            server = HTTPProxyServer(
-                host_name=container.name,
-                domain=base_config.domain,
-                listen=base_config.listen,
-                proxied_host=base_config.proxy_host,
-                proxied_port=exposed_port,
-                docker_container=container,
-            )
-        except PortConflictError as port_conflict_error:
-            raise PortConflictError(
-                f"port {exposed_port} exposed by container {container.name}"
-                " conflicts with proxy configuration"
-            ) from port_conflict_error
-        yield server
+        yield internal_port, exposed_port
+        if not tuning.ports:
+            return
 
 
 @dataclasses.dataclass(frozen=True)
@@ -295,11 +876,27 @@ def find_duplicated_server_property(servers: Iterable[Server]) -> Optional[Dupli
     return None
 
 
-def simplify_proxy_host_names(proxies: Iterable[HTTPProxyServer]) -> Iterable[HTTPProxyServer]:
+def simplify_proxy_host_names(
+    proxies: Iterable[HTTPProxyServer],
+    simplify: Optional[Callable[[Sequence[str]], Iterable[str]]] = None,
+) -> Iterable[HTTPProxyServer]:
+    # simplify gets the container names and, for the additional servers of a
+    # container, the container name and the internal port, e.g. api:9229; it
+    # returns distinct host names, see add_port_host_names
     proxies = tuple(proxies)
-    simplified_host_names = tuple(simplify_host_names([proxy.host_name for proxy in proxies]))
-    for proxy, simplified_host_name in zip(proxies, simplified_host_names, strict=True):
-        yield dataclasses.replace(proxy, host_name=simplified_host_name)
+
+    def name_key(proxy: HTTPProxyServer) -> Optional[str]:
+        container_name = proxy.docker_container.qualified_name
+        if not proxy.host_name.startswith(container_name):
+            return None
+        suffix = proxy.host_name[len(container_name):]
+        return container_name + suffix.replace("-", ":", 1)
+
+    keys = tuple(dict.fromkeys(key for key in map(name_key, proxies) if key is not None))
+    host_names = dict(zip(keys, (simplify or simplify_host_names)(keys), strict=True))
+    for proxy in proxies:
+        key = name_key(proxy)
+        yield proxy if key is None else dataclasses.replace(proxy, host_name=host_names[key])
 
 
 def simplify_host_names(names: Iterable[str]) -> Iterable[str]:
@@ -312,24 +909,212 @@ def simplify_host_names(names: Iterable[str]) -> Iterable[str]:
         return name[:-6] if name.endswith("-nginx") else name
 
     names = tuple(names)
+    container_names = simplified_names = tuple(name for name in names if ":" not in name)
     for func in (strip_number_suffix, strip_nginx_suffix,):
-        stripped_names = tuple(map(func, names))
-        if len(set(stripped_names)) == len(names):
-            names = stripped_names
-    return names
+        stripped_names = tuple(map(func, simplified_names))
+        if len(set(stripped_names)) == len(simplified_names):
+            simplified_names = stripped_names
+    host_names = dict(zip(container_names, simplified_names, strict=True))
+    add_port_host_names(names, host_names, set(simplified_names))
+    return tuple(host_names[name] for name in names)
+
+
+def add_port_host_names(names: Iterable[str], host_names: dict[str, str], taken: set[str]) -> None:
+    # an additional server of a container, named container:port, gets the host name
+    # of the container with the port appended, unless another server has it already
+    for name in names:
+        if name in host_names:
+            continue
+        container_name, _, port = name.partition(":")
+        candidate = f"{host_names.get(container_name, container_name)}-{port}"
+        host_name = candidate
+        number = 2
+        while host_name in taken:
+            host_name = f"{candidate}-{number}"
+            number += 1
+        host_names[name] = host_name
+        taken.add(host_name)
+
+
+class ConvergenceLog:
+    # Durations of the phases of past regenerations, from listing the containers
+    # to the first request served with the new configuration. The entries are
+    # kept between runs, for a histogram in the output and on the dashboard.
+
+    VERSION = 1
+    PHASES = ("list", "generate", "render", "write", "reload", "verify")
+    MAX_ENTRIES = 200
+    # upper bounds of the histogram buckets, in seconds
+    BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, path: str, entries: Optional[list[dict[str, float]]] = None) -> None:
+        self.path = path
+        self.entries = entries or []
+        self.current: dict[str, float] = {}
+
+    @staticmethod
+    def load(path: str) -> ConvergenceLog:
+        try:
+            with open(path, "r", encoding="utf-8") as log_file:
+                data = json.load(log_file)
+        except (OSError, ValueError):
+            return ConvergenceLog(path)
+        if not isinstance(data, dict) or data.get("version") != ConvergenceLog.VERSION:
+            return ConvergenceLog(path)
+        return ConvergenceLog(path, data["entries"])
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path + ".tmp", "w", encoding="utf-8") as log_file:
+            json.dump({"version": self.VERSION, "entries": self.entries}, log_file)
+        os.replace(self.path + ".tmp", self.path)
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record(name, time.monotonic() - start)
+
+    def record(self, name: str, duration: float) -> None:
+        self.current[name] = duration
+
+    def discard(self) -> None:
+        self.current = {}
+
+    def finish(self) -> dict[str, float]:
+        entry = dict(self.current, total=sum(self.current.values()))
+        self.entries = (self.entries + [entry])[-self.MAX_ENTRIES:]
+        self.current = {}
+        self.save()
+        return entry
+
+    def histogram(self) -> tuple[tuple[str, int], ...]:
+        counts = [0] * (len(self.BUCKETS) + 1)
+        for entry in self.entries:
+            counts[bisect.bisect_left(self.BUCKETS, entry["total"])] += 1
+        labels = [f"up to {bound:g}" for bound in self.BUCKETS] + [f"over {self.BUCKETS[-1]:g}"]
+        return tuple(zip(labels, counts, strict=True))
+
+    def histogram_lines(self) -> list[str]:
+        histogram = self.histogram()
+        most = max(count for _, count in histogram) or 1
+        return [
+            f"{bucket:>10} s {count:>5} {'#' * (count * 40 // most)}"
+            for bucket, count in histogram
+        ]
+
+    @staticmethod
+    def summary(entry: Mapping[str, float]) -> str:
+        phases = ", ".join(
+            f"{phase} {entry[phase] * 1000:.0f} ms"
+            for phase in ConvergenceLog.PHASES if phase in entry
+        )
+        return f"route live {entry['total'] * 1000:.0f} ms after listing containers ({phases})"
+
+
+class HostNameAllocator:
+    # Host names given to containers in previous runs, keyed by container name.
+    # Unlike simplify_host_names, which decides for all names at once, a known
+    # container keeps its host name, so that a new container can't rename the
+    # others. A new container gets each suffix stripped by the rules in turn, as
+    # long as no other container has or wants the stripped name.
+
+    VERSION = 1
+    DEFAULT_RULES = (r"-[0-9]+", r"-nginx")
+
+    def __init__(
+        self,
+        path: str,
+        assignments: Optional[dict[str, str]] = None,
+        rules: Sequence[str] = DEFAULT_RULES,
+    ) -> None:
+        self.path = path
+        self.assignments = assignments or {}
+        self.rules = tuple(re.compile(f"(.+)(?:{rule})") for rule in rules)
+        self.current: dict[str, str] = {}
+
+    @staticmethod
+    def load(path: str, rules: Sequence[str] = DEFAULT_RULES) -> HostNameAllocator:
+        try:
+            with open(path, "r", encoding="utf-8") as names_file:
+                data = json.load(names_file)
+        except (OSError, ValueError):
+            return HostNameAllocator(path, rules=rules)
+        if not isinstance(data, dict) or data.get("version") != HostNameAllocator.VERSION:
+            return HostNameAllocator(path, rules=rules)
+        return HostNameAllocator(path, data["assignments"], rules)
+
+    def save(self) -> None:
+        # containers that are gone keep their names until a new one takes them over
+        taken = set(self.current.values())
+        assignments = {
+            name: host_name for name, host_name in self.assignments.items()
+            if name not in self.current and host_name not in taken
+        }
+        assignments.update(self.current)
+        # kept for the next allocation as well, when the process keeps running
+        self.assignments = assignments
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path + ".tmp", "w", encoding="utf-8") as names_file:
+            json.dump({"version": self.VERSION, "assignments": assignments}, names_file)
+        os.replace(self.path + ".tmp", self.path)
+
+    def allocate(self, names: Sequence[str]) -> tuple[str, ...]:
+        allocated: dict[str, str] = {}
+        taken: set[str] = set()
+        for name in names:
+            host_name = self.assignments.get(name)
+            if host_name is not None and host_name not in taken:
+                allocated[name] = host_name
+                taken.add(host_name)
+        candidates = {name: name for name in names if name not in allocated and ":" not in name}
+        for rule in self.rules:
+            stripped = {name: self.strip(rule, candidate) for name, candidate in candidates.items()}
+            wanted: dict[str, int] = {}
+            for name, candidate in candidates.items():
+                for wanted_name in dict.fromkeys((candidate, stripped[name])):
+                    wanted[wanted_name] = wanted.get(wanted_name, 0) + 1
+            for name, stripped_name in stripped.items():
+                if wanted[stripped_name] == 1 and stripped_name not in taken:
+                    candidates[name] = stripped_name
+        for name, candidate in candidates.items():
+            host_name = candidate
+            number = 2
+            while host_name in taken:
+                host_name = f"{candidate}-{number}"
+                number += 1
+            allocated[name] = host_name
+            taken.add(host_name)
+        add_port_host_names(names, allocated, taken)
+        self.current = allocated
+        return tuple(allocated[name] for name in names)
+
+    @staticmethod
+    def strip(rule: re.Pattern[str], name: str) -> str:
+        match = rule.fullmatch(name)
+        return match.group(1) if match else name
 
 
 @dataclasses.dataclass(frozen=True)
-class HTTPProxy:
+class HTTPProxy:  # pylint: disable=too-many-instance-attributes; (one per main context setting)
     pid_file: str
     error_log_file: str
     access_log_file: str
     listen: int
     servers: tuple[Server, ...]
+    tls_listen: Optional[int] = None
+    certificate: Optional[LocalCertificate] = None
+    # for the parts of requests and responses that don't fit in the buffers, instead
+    # of the compiled-in paths, which are usually only writable by root
+    temp_path: Optional[str] = None
 
     def __post_init__(self) -> None:
         if not self.servers:
             raise ValueError("no servers to set up")
+        if (self.tls_listen is None) != (self.certificate is None):
+            raise ValueError("TLS requires both a port to listen on and a certificate")
         check_uniqueness(self.servers)
 
     @staticmethod
@@ -337,6 +1122,8 @@ class HTTPProxy:
         base_confg: BaseProxyConfig,
         generator: Generator,
         servers: Iterable[Server],
+        certificate: Optional[LocalCertificate] = None,
+        temp_path: Optional[str] = None,
     ) -> HTTPProxy:
         return HTTPProxy(
             pid_file=os.path.join(generator.path_prefix, "nginx.pid"),
@@ -344,6 +1131,9 @@ class HTTPProxy:
             access_log_file=os.path.join(generator.path_prefix, "access.log"),
             listen=base_confg.listen,
             servers=tuple(servers),
+            tls_listen=base_confg.tls_listen,
+            certificate=certificate,
+            temp_path=temp_path or generator.path_prefix,
         )
 
     def config(self) -> str:
@@ -354,10 +1144,10 @@ error_log $error_log_file;
 events { }
 
 http {
-    access_log $access_log_file;
+    $http_directives
 
     server {
-        listen $listen default_server;
+        $default_listen_directives
         server_name _;
         return 400;
     }
@@ -365,11 +1155,31 @@ http {
     $servers
 }
 """)
+        limit_directives = limit_zone_directives(
+            server.tuning for server in self.servers if isinstance(server, HTTPProxyServer)
+        )
+        log_format = " limits" if limit_directives else ""
+        # log formats have to be defined before being used
+        http_directives = limit_directives + [f"access_log {self.access_log_file}{log_format};"]
+        default_listen_directives = [f"listen {self.listen} default_server;"]
+        if self.temp_path is not None:
+            http_directives += [
+                f"{module}_temp_path {os.path.join(self.temp_path, module + '_temp')};"
+                for module in ("client_body", "proxy", "fastcgi", "uwsgi", "scgi")
+            ]
+        if self.certificate is not None:
+            http_directives += self.certificate.directives()
+            default_listen_directives.append(f"listen {self.tls_listen} ssl http2 default_server;")
         servers = textwrap.indent(
             "\n".join(server.config() for server in self.servers),
             "    ",
         )
-        return template.substitute(dataclasses.asdict(self), servers=servers.strip())
+        return template.substitute(
+            dataclasses.asdict(self),
+            http_directives="\n    ".join(http_directives),
+            default_listen_directives="\n        ".join(default_listen_directives),
+            servers=servers.strip(),
+        )
 
 
 @dataclasses.dataclass(frozen=True)
@@ -389,24 +1199,1052 @@ class Generator:
             path_prefix=path_prefix,
         )
 
-    def write(self, config: str) -> str:
+    @property
+    def cache_file(self) -> str:
+        return os.path.join(self.path_prefix, "cache.json")
+
+    @property
+    def tls_path(self) -> str:
+        return os.path.join(self.path_prefix, "tls")
+
+    @property
+    def snapshot_file(self) -> str:
+        return os.path.join(self.path_prefix, "snapshot.json")
+
+    @property
+    def names_file(self) -> str:
+        return os.path.join(self.path_prefix, "names.json")
+
+    @property
+    def convergence_file(self) -> str:
+        return os.path.join(self.path_prefix, "convergence.json")
+
+    def write_snapshot(self, proxy: HTTPProxy, engine: str) -> None:
+        # the built-in engine doesn't write a PID file, its PID is saved instead
+        snapshot = {
+            "version": SNAPSHOT_VERSION,
+            "generated_at": time.time(),
+            "generator": self.name,
+            "engine": engine,
+            "pid_file": proxy.pid_file if engine == "nginx" else None,
+            "pid": os.getpid() if engine != "nginx" else None,
+            "servers": [server.summary() for server in proxy.servers],
+        }
+        os.makedirs(self.path_prefix, exist_ok=True)
+        with open(self.snapshot_file + ".tmp", "w", encoding="utf-8") as snapshot_file:
+            json.dump(snapshot, snapshot_file)
+        os.replace(self.snapshot_file + ".tmp", self.snapshot_file)
+
+    def write(self, config: str, check: Optional[Callable[[str], None]] = None) -> str:
+        # written to a temporary file first, check (e.g. nginx -t) gets its name and
+        # raises to keep the previous configuration
         if not os.path.exists(self.path_prefix):
             os.makedirs(self.path_prefix, exist_ok=True)
         config_filename = os.path.join(self.path_prefix, "nginx.conf")
-        with open(config_filename, "w", encoding="us-ascii") as config_file:
+        with open(config_filename + ".tmp", "w", encoding="us-ascii") as config_file:
             config_file.write(f"# configuration generated automatically by {self.name}\n\n")
             config_file.write(config)
+        try:
+            if check:
+                check(config_filename + ".tmp")
+        except BaseException:
+            os.unlink(config_filename + ".tmp")
+            raise
+        os.replace(config_filename + ".tmp", config_filename)
         return config_filename
 
 
+@dataclasses.dataclass(frozen=True)
+class LocalCertificate:
+    # A wildcard certificate for the container domain, signed by a local CA. Both
+    # are created once and only replaced when they are about to expire, so that
+    # the CA has to be trusted by the browser only once.
+
+    certificate_file: str
+    key_file: str
+    ca_certificate_file: str
+    session_ticket_key_file: str
+
+    CA_VALIDITY_DAYS = 3650
+    VALIDITY_DAYS = 397
+    RENEW_BEFORE_DAYS = 7
+
+    @staticmethod
+    def for_domain(path: str, domain: str) -> LocalCertificate:
+        return LocalCertificate(
+            certificate_file=os.path.join(path, f"wildcard.{domain}.crt"),
+            key_file=os.path.join(path, f"wildcard.{domain}.key"),
+            ca_certificate_file=os.path.join(path, "ca.crt"),
+            session_ticket_key_file=os.path.join(path, "session_ticket.key"),
+        )
+
+    @property
+    def ca_key_file(self) -> str:
+        return os.path.splitext(self.ca_certificate_file)[0] + ".key"
+
+    def ensure(self, domain: str) -> bool:
+        # returns whether anything had to be (re)generated
+        if is_certificate_valid(self.certificate_file) and is_certificate_valid(
+            self.ca_certificate_file
+        ):
+            return False
+        os.makedirs(os.path.dirname(self.certificate_file), mode=0o700, exist_ok=True)
+        if not is_certificate_valid(self.ca_certificate_file):
+            run_openssl(
+                "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-sha256",
+                "-keyout", self.ca_key_file, "-out", self.ca_certificate_file,
+                "-days", str(self.CA_VALIDITY_DAYS),
+                "-subj", "/CN=docker_container_proxy local CA",
+                "-addext", "basicConstraints=critical,CA:TRUE",
+                "-addext", "keyUsage=critical,keyCertSign,cRLSign",
+            )
+        self.issue(domain)
+        return True
+
+    def issue(self, domain: str) -> None:
+        request_file = self.certificate_file + ".csr"
+        extensions_file = self.certificate_file + ".ext"
+        with open(extensions_file, "w", encoding="us-ascii") as extensions:
+            extensions.write(
+                f"subjectAltName=DNS:*.{domain},DNS:{domain}\n"
+                "basicConstraints=CA:FALSE\n"
+                "extendedKeyUsage=serverAuth\n"
+            )
+        run_openssl(
+            "req", "-newkey", "rsa:2048", "-nodes", "-sha256",
+            "-keyout", self.key_file, "-out", request_file, "-subj", f"/CN=*.{domain}",
+        )
+        run_openssl(
+            "x509", "-req", "-sha256", "-in", request_file,
+            "-CA", self.ca_certificate_file, "-CAkey", self.ca_key_file, "-CAcreateserial",
+            "-days", str(self.VALIDITY_DAYS), "-extfile", extensions_file,
+            "-out", self.certificate_file,
+        )
+        os.unlink(request_file)
+        os.unlink(extensions_file)
+        # new ticket keys along with the new certificate, nginx requires 80 bytes
+        with open(self.session_ticket_key_file, "wb") as session_ticket_key:
+            session_ticket_key.write(os.urandom(80))
+
+    def directives(self) -> list[str]:
+        return [
+            f"ssl_certificate {self.certificate_file};",
+            f"ssl_certificate_key {self.key_file};",
+            "ssl_protocols TLSv1.2 TLSv1.3;",
+            "ssl_session_cache shared:SSL:10m;",
+            "ssl_session_timeout 1d;",
+            "ssl_session_tickets on;",
+            f"ssl_session_ticket_key {self.session_ticket_key_file};",
+        ]
+
+
+def is_certificate_valid(certificate_filename: str) -> bool:
+    if not os.path.exists(certificate_filename):
+        return False
+    process = subprocess.run(
+        [
+            "openssl", "x509", "-noout", "-in", certificate_filename,
+            "-checkend", str(LocalCertificate.RENEW_BEFORE_DAYS * 24 * 3600),
+        ],
+        capture_output=True,
+        check=False,
+    )
+    return process.returncode == 0
+
+
+def run_openssl(*args: str) -> None:
+    subprocess.run(["openssl", *args], capture_output=True, check=True)
+
+
+SNAPSHOT_VERSION = 1
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def read_snapshot(path: str, max_age: Optional[float] = None) -> dict[str, Any]:
+    try:
+        with open(path, "r", encoding="utf-8") as snapshot_file:
+            snapshot = json.load(snapshot_file)
+    except FileNotFoundError as not_found_error:
+        raise SnapshotError("no configuration has been generated yet") from not_found_error
+    except (OSError, ValueError) as read_error:
+        raise SnapshotError(f"unable to read {path}: {read_error}") from read_error
+    if not isinstance(snapshot, dict) or snapshot.get("version") != SNAPSHOT_VERSION:
+        raise SnapshotError(f"unsupported snapshot format in {path}, re-run the generation")
+    age = time.time() - snapshot["generated_at"]
+    if max_age is not None and age > max_age:
+        raise SnapshotError(f"the last generation is {age:.0f} seconds old")
+    pid = snapshot["pid"] if snapshot["pid"] is not None else read_pid(snapshot["pid_file"])
+    snapshot["age"] = age
+    snapshot["running"] = pid is not None and is_running(pid)
+    return snapshot
+
+
+def read_pid(pid_filename: str) -> Optional[int]:
+    try:
+        with open(pid_filename, "r", encoding="us-ascii") as pid_file:
+            return int(pid_file.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def is_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def script_digest() -> str:
+    # changes with every version of the script
+    with open(__file__, "rb") as script_file:
+        return hashlib.sha1(script_file.read()).hexdigest()
+
+
+class GenerationCache:
+    # Parsed containers from previous runs, keyed by container ID and creation
+    # time. A cached container is reused as long as its `docker ps` record is
+    # unchanged. Server blocks are not cached, rendering one is cheaper than
+    # computing a key that tells whether it changed.
+
+    # entries of another version of the script may have been parsed differently
+    VERSION = "2-" + script_digest()[:12]
+
+    def __init__(self, path: str, entries: Optional[dict[str, dict[str, Any]]] = None) -> None:
+        self.path = path
+        self.entries = entries or {}
+        self.records = {entry["record"]: key for key, entry in self.entries.items()}
+        self.used_keys: set[str] = set()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def load(path: str) -> GenerationCache:
+        try:
+            with open(path, "r", encoding="utf-8") as cache_file:
+                data = json.load(cache_file)
+        except (OSError, ValueError):
+            return GenerationCache(path)
+        if not isinstance(data, dict) or data.get("version") != GenerationCache.VERSION:
+            return GenerationCache(path)
+        return GenerationCache(path, data["entries"])
+
+    def reset(self) -> None:
+        # before listing containers again, so that the ones that are gone are evicted
+        with self.lock:
+            self.used_keys = set()
+
+    def save(self) -> None:
+        # entries of containers that are gone are not carried over
+        entries = {key: entry for key, entry in self.entries.items() if key in self.used_keys}
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path + ".tmp", "w", encoding="utf-8") as cache_file:
+            json.dump({"version": self.VERSION, "entries": entries}, cache_file)
+        os.replace(self.path + ".tmp", self.path)
+
+    @staticmethod
+    def digest(data: bytes) -> str:
+        return hashlib.sha1(data).hexdigest()
+
+    @staticmethod
+    def key(container: DockerContainer) -> Optional[str]:
+        if not container.container_id:
+            return None
+        return container.container_id + "@" + container.created_at
+
+    def container(self, record: bytes) -> Optional[DockerContainer]:
+        record_digest = self.digest(record)
+        with self.lock:
+            key = self.records.get(record_digest)
+            if key is None or self.entries[key]["record"] != record_digest:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.used_keys.add(key)
+            return container_from_json(self.entries[key]["container"])
+
+    def add_container(self, record: bytes, container: DockerContainer) -> None:
+        key = self.key(container)
+        if key is None:
+            return
+        with self.lock:
+            self.entries[key] = {
+                "record": self.digest(record),
+                "container": container_to_json(container),
+            }
+            self.records[self.entries[key]["record"]] = key
+            self.used_keys.add(key)
+
+
+def container_to_json(container: DockerContainer) -> dict[str, object]:
+    return {
+        "name": container.name,
+        "ports": [[port.exposed, port.internal, port.ip_version.value] for port in container.ports],
+        "labels": [list(label) for label in container.labels],
+        "container_id": container.container_id,
+        "created_at": container.created_at,
+    }
+
+
+def container_from_json(data: dict[str, Any]) -> DockerContainer:
+    return DockerContainer(
+        name=data["name"],
+        ports=tuple(
+            PortMapping(exposed=exposed, internal=internal, ip_version=IPVersion(ip_version))
+            for exposed, internal, ip_version in data["ports"]
+        ),
+        labels=tuple((key, value) for key, value in data["labels"]),
+        container_id=data["container_id"],
+        created_at=data["created_at"],
+    )
+
+
+HOP_BY_HOP_HEADERS = frozenset((
+    "connection", "keep-alive", "proxy-connection", "te", "trailer", "upgrade", "expect",
+))
+
+
+@dataclasses.dataclass(frozen=True)
+class HTTPMessageHead:
+    start_line: str
+    headers: tuple[tuple[str, str], ...]
+
+    @staticmethod
+    async def read(reader: asyncio.StreamReader) -> HTTPMessageHead:
+        head = await reader.readuntil(b"\r\n\r\n")
+        start_line, *header_lines = head[:-4].decode("latin-1").split("\r\n")
+        headers = []
+        for header_line in header_lines:
+            name, separator, value = header_line.partition(":")
+            if not separator:
+                raise ValueError(f"malformed header line: {header_line}")
+            headers.append((name.strip(), value.strip()))
+        return HTTPMessageHead(start_line=start_line, headers=tuple(headers))
+
+    def header(self, name: str) -> Optional[str]:
+        values = [value for header, value in self.headers if header.lower() == name]
+        return ", ".join(values) if values else None
+
+    def has_token(self, name: str, token: str) -> bool:
+        value = self.header(name)
+        return value is not None and token in (t.strip().lower() for t in value.split(","))
+
+    @property
+    def version(self) -> str:
+        first, _, rest = self.start_line.partition(" ")
+        return first if first.startswith("HTTP/") else rest.rpartition(" ")[2]
+
+    def keep_alive(self) -> bool:
+        if self.version == "HTTP/1.0":
+            return self.has_token("connection", "keep-alive")
+        return not self.has_token("connection", "close")
+
+    def has_body(self) -> bool:
+        framing_headers = ("transfer-encoding", "content-length")
+        return any(self.header(name) is not None for name in framing_headers)
+
+    def has_ambiguous_length(self) -> bool:
+        # RFC 9112 6.3, the way to smuggle a request past a proxy that reads one
+        # header and an upstream that reads the other
+        return self.header("transfer-encoding") is not None and (
+            self.header("content-length") is not None
+        )
+
+    def forwarded(self, start_line: str, extra_headers: Iterable[tuple[str, str]]) -> bytes:
+        # the body is relayed as it is framed by Transfer-Encoding, if any
+        dropped_headers = HOP_BY_HOP_HEADERS | {"host"} | (
+            {"content-length"} if self.header("transfer-encoding") is not None else set()
+        )
+        headers = [
+            (name, value) for name, value in self.headers if name.lower() not in dropped_headers
+        ]
+        headers += extra_headers
+        lines = [start_line] + [f"{name}: {value}" for name, value in headers]
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def relay_body(
+    head: HTTPMessageHead,
+    reader: asyncio.StreamReader,
+    writer: asyncio.StreamWriter,
+    until_eof: bool = False,
+    timeout: Optional[float] = None,
+) -> None:
+    # the timeout applies to each read, like proxy_read_timeout in nginx
+    if head.has_token("transfer-encoding", "chunked"):
+        while True:
+            size_line = await asyncio.wait_for(reader.readuntil(b"\r\n"), timeout)
+            writer.write(size_line)
+            size = int(size_line.split(b";", 1)[0], 16)
+            if size == 0:
+                break
+            await copy_bytes(reader, writer, size + 2, timeout)
+        # trailer section, terminated by an empty line
+        while True:
+            trailer_line = await asyncio.wait_for(reader.readuntil(b"\r\n"), timeout)
+            writer.write(trailer_line)
+            if trailer_line == b"\r\n":
+                break
+        await writer.drain()
+    elif head.header("content-length") is not None:
+        await copy_bytes(reader, writer, int(str(head.header("content-length"))), timeout)
+    elif until_eof:
+        await copy_bytes(reader, writer, None, timeout)
+
+
+async def copy_bytes(
+    reader: asyncio.StreamReader,
+    writer: asyncio.StreamWriter,
+    count: Optional[int],
+    timeout: Optional[float] = None,
+) -> None:
+    # chunks are passed on as they arrive, without joining them into a single buffer
+    while count is None or count > 0:
+        chunk = await asyncio.wait_for(
+            reader.read(65536 if count is None else min(count, 65536)), timeout,
+        )
+        if not chunk:
+            if count is None:
+                return
+            raise asyncio.IncompleteReadError(b"", count)
+        writer.write(chunk)
+        await writer.drain()
+        if count is not None:
+            count -= len(chunk)
+
+
+@dataclasses.dataclass(frozen=True)
+class Upstream:
+    host: str
+    port: int
+    # for each read from the upstream, 60s like proxy_read_timeout by default
+    read_timeout: float = 60.0
+
+
+@dataclasses.dataclass(frozen=True)
+class StaticPage:
+    path: str
+    content_type: str
+
+
+class UpstreamPool:
+
+    def __init__(self, max_idle_per_upstream: int = 16, connect_timeout: float = 5.0) -> None:
+        self.max_idle_per_upstream = max_idle_per_upstream
+        self.connect_timeout = connect_timeout
+        self.idle: dict[Upstream, list[tuple[asyncio.StreamReader, asyncio.StreamWriter]]] = {}
+        self.connections_opened = 0
+
+    async def acquire(
+        self,
+        upstream: Upstream,
+    ) -> tuple[asyncio.StreamReader, asyncio.StreamWriter, bool]:
+        idle = self.idle.get(upstream, [])
+        while idle:
+            reader, writer = idle.pop()
+            if not reader.at_eof() and not writer.is_closing():
+                return reader, writer, True
+            writer.close()
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(upstream.host, upstream.port),
+            self.connect_timeout,
+        )
+        self.connections_opened += 1
+        return reader, writer, False
+
+    def release(
+        self,
+        upstream: Upstream,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+    ) -> None:
+        idle = self.idle.setdefault(upstream, [])
+        if len(idle) >= self.max_idle_per_upstream or reader.at_eof():
+            writer.close()
+            return
+        idle.append((reader, writer))
+
+    def close(self) -> None:
+        for idle in self.idle.values():
+            for _, writer in idle:
+                writer.close()
+        self.idle.clear()
+
+
+class AsyncioProxyEngine:
+    # An alternative to nginx, serving the same HTTPProxy model from within this
+    # script. Routing updates replace the routing table as a whole, connections
+    # that are already open are served with the new table from their next request.
+
+    def __init__(self, proxy: HTTPProxy, static_path: str) -> None:
+        self.static_path = static_path
+        self.pool = UpstreamPool()
+        self.routes: dict[str, Union[Upstream, StaticPage]] = {}
+        self.listen = proxy.listen
+        self.update(proxy)
+
+    def update(self, proxy: HTTPProxy) -> None:
+        if proxy.listen != self.listen:
+            raise ValueError("the listening port can't be changed without a restart")
+        routes: dict[str, Union[Upstream, StaticPage]] = {}
+        for server in proxy.servers:
+            if isinstance(server, HTTPProxyServer):
+                read_timeout = server.tuning.read_timeout
+                routes[server.server_name] = Upstream(
+                    server.proxied_host,
+                    server.proxied_port,
+                    time_seconds(read_timeout) if read_timeout is not None else 60.0,
+                )
+            elif isinstance(server, DashboardServer):
+                routes[server.server_name] = self.write_static_page(server)
+        self.routes = routes
+
+    def write_static_page(self, server: DashboardServer) -> StaticPage:
+        os.makedirs(self.static_path, exist_ok=True)
+        path = os.path.join(self.static_path, server.server_name + ".html")
+        # replaced atomically, so that a page being sent is not cut short
+        with open(path + ".tmp", "w", encoding="utf-8") as page_file:
+            page_file.write(server.html())
+        os.replace(path + ".tmp", path)
+        return StaticPage(path=path, content_type="text/html")
+
+    def route(self, request: HTTPMessageHead) -> Union[Upstream, StaticPage, None]:
+        host = request.header("host") or ""
+        match = re.fullmatch(r"^(.*?)(:[0-9]+)?$", host.lower())
+        return self.routes.get(match.group(1) if match else host)
+
+    async def start(self, host: Optional[str] = None) -> asyncio.Server:
+        return await asyncio.start_server(self.handle_client, host, self.listen)
+
+    async def handle_client(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+    ) -> None:
+        try:
+            keep_alive = True
+            while keep_alive:
+                try:
+                    request = await HTTPMessageHead.read(reader)
+                except asyncio.IncompleteReadError:
+                    break
+                keep_alive = await self.handle_request(request, reader, writer)
+        except (
+            ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+            asyncio.TimeoutError,
+        ):
+            pass
+        except ValueError:
+            # malformed request, there's no point in trying to respond
+            pass
+        finally:
+            writer.close()
+
+    async def handle_request(
+        self,
+        request: HTTPMessageHead,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+    ) -> bool:
+        route = self.route(request)
+        keep_alive = request.keep_alive()
+        if request.has_ambiguous_length():
+            await self.send_status(writer, 400, "Bad Request", False)
+            return False
+        if request.has_token("expect", "100-continue"):
+            writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+        if route is None:
+            await self.discard_body(request, reader)
+            await self.send_status(writer, 400, "Bad Request", keep_alive)
+        elif isinstance(route, StaticPage):
+            await self.discard_body(request, reader)
+            await self.send_static_page(writer, route, request, keep_alive)
+        else:
+            keep_alive = await self.forward(request, reader, writer, route, keep_alive)
+        return keep_alive
+
+    @staticmethod
+    async def discard_body(request: HTTPMessageHead, reader: asyncio.StreamReader) -> None:
+        length = request.header("content-length")
+        if length is not None:
+            await reader.readexactly(int(length))
+        elif request.has_body():
+            raise ValueError("chunked request body not supported here")
+
+    @staticmethod
+    async def send_status(
+        writer: asyncio.StreamWriter,
+        status: int,
+        reason: str,
+        keep_alive: bool,
+    ) -> None:
+        writer.write(
+            f"HTTP/1.1 {status} {reason}\r\n"
+            "Content-Length: 0\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+            "\r\n".encode("latin-1")
+        )
+        await writer.drain()
+
+    @staticmethod
+    async def send_static_page(
+        writer: asyncio.StreamWriter,
+        page: StaticPage,
+        request: HTTPMessageHead,
+        keep_alive: bool,
+    ) -> None:
+        with open(page.path, "rb") as page_file:
+            size = os.fstat(page_file.fileno()).st_size
+            writer.write(
+                "HTTP/1.1 200 OK\r\n"
+                f"Content-Type: {page.content_type}\r\n"
+                f"Content-Length: {size}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+                "\r\n".encode("latin-1")
+            )
+            await writer.drain()
+            if not request.start_line.startswith("HEAD "):
+                await asyncio.get_running_loop().sendfile(writer.transport, page_file)
+
+    async def forward(
+        self,
+        request: HTTPMessageHead,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        upstream: Upstream,
+        keep_alive: bool,
+    ) -> bool:
+        try:
+            response, upstream_reader, upstream_writer = await self.exchange(
+                request, reader, upstream,
+            )
+        except asyncio.TimeoutError:
+            # connecting or waiting for the response head took too long
+            await self.send_status(writer, 504, "Gateway Timeout", False)
+            return False
+        except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            # LimitOverrunError: response head larger than the stream buffer
+            await self.send_status(writer, 502, "Bad Gateway", False)
+            return False
+        status = int(response.start_line.split(" ", 2)[1])
+        has_body = not (request.start_line.startswith("HEAD ") or status in (204, 304))
+        delimited = response.has_body() or not has_body
+        keep_alive = keep_alive and delimited
+        writer.write(response.forwarded(
+            response.start_line,
+            [("Connection", "keep-alive" if keep_alive else "close")],
+        ))
+        try:
+            if has_body:
+                await relay_body(
+                    response, upstream_reader, writer, until_eof=True,
+                    timeout=upstream.read_timeout,
+                )
+            await writer.drain()
+        except BaseException:
+            # the client went away, or the upstream stalled or ended the body early,
+            # either way the upstream connection is left in the middle of a response
+            upstream_writer.close()
+            raise
+        if delimited and response.keep_alive():
+            self.pool.release(upstream, upstream_reader, upstream_writer)
+        else:
+            upstream_writer.close()
+        return keep_alive
+
+    async def exchange(
+        self,
+        request: HTTPMessageHead,
+        reader: asyncio.StreamReader,
+        upstream: Upstream,
+    ) -> tuple[HTTPMessageHead, asyncio.StreamReader, asyncio.StreamWriter]:
+        method, target, _ = request.start_line.split(" ", 2)
+        upstream_request = request.forwarded(
+            f"{method} {target} HTTP/1.1",
+            [("Host", f"{upstream.host}:{upstream.port}")],
+        )
+        while True:
+            upstream_reader, upstream_writer, reused = await self.pool.acquire(upstream)
+            try:
+                upstream_writer.write(upstream_request)
+                await relay_body(request, reader, upstream_writer)
+                response = await self.read_response(upstream_reader, upstream)
+                while response.start_line.split(" ", 2)[1].startswith("1"):
+                    response = await self.read_response(upstream_reader, upstream)
+                return response, upstream_reader, upstream_writer
+            except (ConnectionError, asyncio.IncompleteReadError):
+                upstream_writer.close()
+                # an idle pooled connection may have been closed by the upstream in the
+                # meantime, which is only safe to retry if nothing has been consumed
+                if not reused or request.has_body():
+                    raise
+            except (asyncio.LimitOverrunError, asyncio.TimeoutError, ValueError):
+                upstream_writer.close()
+                raise
+
+    @staticmethod
+    async def read_response(
+        upstream_reader: asyncio.StreamReader,
+        upstream: Upstream,
+    ) -> HTTPMessageHead:
+        return await asyncio.wait_for(HTTPMessageHead.read(upstream_reader), upstream.read_timeout)
+
+
+class DNSResponder(asyncio.DatagramProtocol):
+    # Answers queries for the server names of the proxy with a single address,
+    # so that /etc/hosts doesn't have to be kept in sync with the containers.
+    # Any other name gets NXDOMAIN. Routing updates replace the set of names as
+    # a whole, like in AsyncioProxyEngine.
+
+    # short, names come and go with containers
+    TTL = 5
+
+    def __init__(self, proxy: HTTPProxy, address: str) -> None:
+        self.address = ipaddress.ip_address(address)
+        self.names: frozenset[str] = frozenset()
+        self.transport: Optional[asyncio.DatagramTransport] = None
+        self.queries = 0
+        self.update(proxy)
+
+    def update(self, proxy: HTTPProxy) -> None:
+        self.names = frozenset(server.server_name.lower() for server in proxy.servers)
+
+    async def start(self, port: int) -> asyncio.DatagramTransport:
+        transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+            lambda: self,
+            local_addr=(str(self.address), port),
+        )
+        return transport
+
+    def serve_in_thread(self, port: int) -> None:
+        # for the nginx supervisor, which doesn't run an event loop of its own
+
+        async def serve() -> None:
+            await self.start(port)
+            started.set()
+            await asyncio.Event().wait()
+
+        started = threading.Event()
+        threading.Thread(target=asyncio.run, args=(serve(),), daemon=True).start()
+        if not started.wait(5):
+            raise OSError(f"DNS responder didn't start on port {port}")
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self.transport = cast(asyncio.DatagramTransport, transport)
+
+    def datagram_received(self, data: bytes, addr: tuple[Union[str, Any], int]) -> None:
+        response = self.respond(data)
+        if response is not None and self.transport is not None:
+            self.transport.sendto(response, addr)
+
+    def respond(self, query: bytes) -> Optional[bytes]:
+        parsed_query = self.parse_query(query)
+        if parsed_query is None:
+            return None
+        self.queries += 1
+        query_id, flags, name, record_type, record_class, question = parsed_query
+        # not a standard query: NOTIMP, unknown name: NXDOMAIN
+        opcode = flags & 0x7800
+        rcode = 4 if opcode else 0 if name in self.names else 3
+        answer = self.answer(record_type, record_class) if rcode == 0 else b""
+        # response, authoritative, recursion desired copied from the query
+        response_flags = 0x8000 | opcode | 0x0400 | (flags & 0x0100) | rcode
+        header = struct.pack("!HHHHHH", query_id, response_flags, 1, 1 if answer else 0, 0, 0)
+        return header + question + answer
+
+    @staticmethod
+    def parse_query(query: bytes) -> Optional[tuple[int, int, str, int, int, bytes]]:
+        # RFC 1035, a single question without compressed names is all resolvers send
+        try:
+            query_id, flags, question_count = struct.unpack("!HHH", query[:6])
+            labels = []
+            offset = 12
+            while query[offset]:
+                length = query[offset]
+                if length > 63:
+                    return None
+                labels.append(query[offset + 1:offset + 1 + length])
+                offset += 1 + length
+            record_type, record_class = struct.unpack("!HH", query[offset + 1:offset + 5])
+        except (struct.error, IndexError):
+            return None
+        if flags & 0x8000 or question_count != 1:
+            return None
+        name = b".".join(labels).decode("ascii", errors="replace").lower()
+        return query_id, flags, name, record_type, record_class, query[12:offset + 5]
+
+    def answer(self, record_type: int, record_class: int) -> bytes:
+        address_type = 1 if self.address.version == 4 else 28
+        # other types of existing names get an empty answer
+        if record_class != 1 or record_type not in (address_type, 255):
+            return b""
+        packed_address = self.address.packed
+        return b"\xc0\x0c" + struct.pack(
+            "!HHIH", address_type, 1, self.TTL, len(packed_address)
+        ) + packed_address
+
+
+def run_engine(
+    proxy: HTTPProxy,
+    static_path: str,
+    regenerate: Callable[[], HTTPProxy],
+    dns: Optional[tuple[DNSResponder, int]] = None,
+    updated: Optional[Callable[[float], None]] = None,
+) -> None:
+
+    async def serve() -> None:
+        engine = AsyncioProxyEngine(proxy, static_path)
+        server = await engine.start()
+        if dns:
+            await dns[0].start(dns[1])
+
+        async def reload() -> None:
+            try:
+                # listing containers blocks, keep serving requests in the meantime
+                updated_proxy = await loop.run_in_executor(None, regenerate)
+                start = time.monotonic()
+                engine.update(updated_proxy)
+                latency = time.monotonic() - start
+                if dns:
+                    dns[0].update(updated_proxy)
+            except Exception as error:  # pylint: disable=broad-exception-caught
+                print(f"keeping previous routes, regeneration failed: {error}", file=sys.stderr)
+                return
+            print("routes updated")
+            if updated:
+                # e.g. requests through the engine, which has to keep serving them
+                await loop.run_in_executor(None, updated, latency)
+
+        reloads: set[asyncio.Task[None]] = set()
+
+        def schedule_reload() -> None:
+            task = asyncio.ensure_future(reload())
+            reloads.add(task)
+            task.add_done_callback(reloads.discard)
+
+        loop = asyncio.get_running_loop()
+        loop.add_signal_handler(signal.SIGHUP, schedule_reload)
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(serve())
+
+
+NGINX_BINARY = "/usr/sbin/nginx"
+
+
 def restart_proxy(config_filename: str, pid_filename: str) -> None:
-    nginx_command = ["/usr/sbin/nginx", "-c", config_filename]
-    if os.path.exists(pid_filename):
+    nginx_command = [NGINX_BINARY, "-c", config_filename]
+    pid = read_pid(pid_filename)
+    if pid is not None and is_nginx_running(pid):
         nginx_command += ["-s", "reload"]
+    elif os.path.exists(pid_filename):
+        # left behind by a crash or a reboot, nginx would refuse to reload
+        os.unlink(pid_filename)
     subprocess.run(nginx_command, check=True)
 
 
-def main() -> None:
+def wait_for_generation(
+    listen: int,
+    dashboard_server: DashboardServer,
+    timeout: float = 5.0,
+) -> bool:
+    # a request through the proxy, the dashboard is served by the new configuration
+    # once it has the new generation; other servers are reloaded along with it
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        connection = http.client.HTTPConnection("127.0.0.1", listen, timeout=1)
+        try:
+            connection.request("GET", "/", headers={"Host": dashboard_server.server_name})
+            if dashboard_server.generation.encode() in connection.getresponse().read():
+                return True
+        except (OSError, http.client.HTTPException):
+            pass
+        finally:
+            connection.close()
+        time.sleep(0.01)
+    return False
+
+
+def is_nginx_running(pid: int) -> bool:
+    if not is_running(pid):
+        return False
+    try:
+        with open(f"/proc/{pid}/comm", "r", encoding="utf-8") as comm_file:
+            return comm_file.read().strip() == "nginx"
+    except OSError:
+        # no procfs, assume the PID has not been reused
+        return True
+
+
+def has_procfs() -> bool:
+    return os.path.isdir("/proc/self")
+
+
+def child_pids(pid: int) -> set[int]:
+    children = set()
+    try:
+        entries = list(os.scandir("/proc"))
+    except OSError as scan_error:
+        raise RuntimeError(f"unable to list nginx worker processes: {scan_error}") from scan_error
+    for entry in entries:
+        if not entry.name.isdigit():
+            continue
+        try:
+            with open(os.path.join(entry.path, "stat"), "r", encoding="utf-8") as stat_file:
+                stat = stat_file.read()
+        except OSError:
+            continue
+        # the process name may contain spaces and parentheses
+        parent_pid = int(stat.rpartition(")")[2].split()[1])
+        if parent_pid == pid:
+            children.add(int(entry.name))
+    return children
+
+
+class NginxSupervisor:
+    # Runs nginx in the foreground as a child process, so that its state is known
+    # without relying on the PID file, and restarts it with a growing delay if it
+    # exits unexpectedly.
+
+    READY_TIMEOUT = 10.0
+    MAX_BACKOFF = 30.0
+
+    def __init__(self, config_filename: str, pid_filename: str, binary: str = NGINX_BINARY) -> None:
+        self.config_filename = config_filename
+        self.pid_filename = pid_filename
+        self.binary = binary
+        self.process: Optional[subprocess.Popen[bytes]] = None
+        self.workers: set[int] = set()
+        self.stopping = False
+        self.reload_requested = False
+
+    def start(self) -> None:
+        pid = read_pid(self.pid_filename)
+        if pid is not None and is_nginx_running(pid):
+            raise RuntimeError(f"nginx is already running with PID {pid}, stop it first")
+        if os.path.exists(self.pid_filename):
+            os.unlink(self.pid_filename)
+        self.process = subprocess.Popen(  # pylint: disable=consider-using-with
+            [self.binary, "-c", self.config_filename, "-g", "daemon off;"],
+        )
+        self.workers = self.wait_for_workers(set())
+
+    def wait_for_workers(self, previous_workers: set[int]) -> set[int]:
+        # a new generation of workers is serving the configuration it was started with
+        assert self.process is not None
+        deadline = time.monotonic() + self.READY_TIMEOUT
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"nginx exited with code {self.process.returncode}")
+            workers = child_pids(self.process.pid)
+            if workers - previous_workers:
+                return workers - previous_workers
+            time.sleep(0.01)
+        raise RuntimeError(f"no nginx workers started within {self.READY_TIMEOUT}s")
+
+    def check_config(self, config_filename: Optional[str] = None) -> None:
+        subprocess.run(
+            [self.binary, "-t", "-q", "-c", config_filename or self.config_filename],
+            check=True,
+            capture_output=True,
+        )
+
+    def reload(self) -> float:
+        # returns the time it took for the new configuration to be served
+        assert self.process is not None
+        self.check_config()
+        start = time.monotonic()
+        self.process.send_signal(signal.SIGHUP)
+        self.workers = self.wait_for_workers(self.workers)
+        return time.monotonic() - start
+
+    def stop(self) -> None:
+        self.stopping = True
+        if self.process is not None and self.process.poll() is None:
+            self.process.send_signal(signal.SIGQUIT)
+            try:
+                self.process.wait(self.READY_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+
+    def run(
+        self,
+        regenerate: Callable[[], None],
+        reloaded: Optional[Callable[[float], None]] = None,
+    ) -> None:
+        # SIGHUP regenerates the configuration and reloads it, SIGINT and SIGTERM stop nginx
+        def request_reload(*_: Any) -> None:
+            self.reload_requested = True
+
+        def request_stop(*_: Any) -> None:
+            self.stopping = True
+
+        signal.signal(signal.SIGHUP, request_reload)
+        signal.signal(signal.SIGINT, request_stop)
+        signal.signal(signal.SIGTERM, request_stop)
+        self.start()
+        print(f"nginx started with PID {self.process.pid if self.process else None}")
+        try:
+            self.supervise(regenerate, reloaded)
+        finally:
+            self.stop()
+
+    def supervise(
+        self,
+        regenerate: Callable[[], None],
+        reloaded: Optional[Callable[[float], None]] = None,
+    ) -> None:
+        assert self.process is not None
+        backoff = 0.0
+        started = time.monotonic()
+        while not self.stopping:
+            if self.reload_requested:
+                self.reload_requested = False
+                try:
+                    regenerate()
+                    latency = self.reload()
+                    print(f"configuration reloaded in {latency * 1000:.0f} ms")
+                    if reloaded:
+                        reloaded(latency)
+                # nginx keeps running whatever went wrong, e.g. an invalid label or a
+                # Docker endpoint that doesn't respond
+                except Exception as error:  # pylint: disable=broad-exception-caught
+                    print(f"keeping previous configuration: {error}", file=sys.stderr)
+            try:
+                self.process.wait(0.2)
+            except subprocess.TimeoutExpired:
+                continue
+            if self.stopping:
+                break
+            if time.monotonic() - started > 60:
+                backoff = 0.0
+            backoff = min(max(backoff * 2, 1.0), self.MAX_BACKOFF)
+            print(
+                f"nginx exited with code {self.process.returncode},"
+                f" restarting in {backoff:.0f}s",
+                file=sys.stderr,
+            )
+            deadline = time.monotonic() + backoff
+            while not self.stopping and time.monotonic() < deadline:
+                time.sleep(0.1)
+            if self.stopping:
+                break
+            try:
+                self.start()
+            except RuntimeError as error:
+                print(f"unable to restart nginx: {error}", file=sys.stderr)
+            started = time.monotonic()
+
+
+def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(
         description="Configure and run a nginx HTTP proxy for Docker containers.",
         add_help=False,  # avoid conflict with -h host
@@ -415,35 +2253,462 @@ def main() -> None:
     parser.add_argument("-p", dest="port", help="listen on port", default=8080, type=int)
     parser.add_argument("-h", dest="host", help="proxy host", default="localhost")
     parser.add_argument("-d", dest="domain", help="domain for containers", default="test")
+    parser.add_argument(
+        "--tls-port", dest="tls_port", metavar="PORT", type=int,
+        help="also listen for HTTPS and HTTP/2 connections on port, with a locally generated"
+        " certificate"
+    )
+    parser.add_argument(
+        "--rate-limit", dest="rate_limit", metavar="RATE", type=parse_rate,
+        help="limit requests to each container, e.g. 10r/s; can be overridden with the"
+        " proxy.rate_limit label"
+    )
+    parser.add_argument(
+        "--burst", dest="burst", metavar="N", type=parse_count,
+        help="with a rate limit, number of requests allowed in excess of it"
+    )
+    parser.add_argument(
+        "--connection-limit", dest="connection_limit", metavar="N", type=parse_count,
+        help="limit concurrent connections to each container; can be overridden with the"
+        " proxy.connection_limit label"
+    )
+    parser.add_argument(
+        "--connect-timeout", dest="connect_timeout", metavar="TIME", type=parse_time,
+        default="2s",
+        help="time to wait for a container to accept a connection; can be overridden with"
+        " the proxy.connect_timeout label"
+    )
+    parser.add_argument(
+        "--read-timeout", dest="read_timeout", metavar="TIME", type=parse_time,
+        help="time to wait for a container to respond, nginx waits 60s by default; can be"
+        " overridden with the proxy.read_timeout label"
+    )
+    parser.add_argument(
+        "--next-upstream", dest="next_upstream", metavar="CONDITIONS", type=parse_next_upstream,
+        default="error",
+        help="when to retry a request with the next address of the proxied host, e.g."
+        " \"error timeout\" or off; can be overridden with the proxy.next_upstream label"
+    )
+    parser.add_argument(
+        "--no-error-page", dest="error_page", action="store_false",
+        help="let nginx display its own page when a container doesn't respond, instead of"
+        " one naming the container and linking to the dashboard"
+    )
+    parser.add_argument(
+        "--buffers", dest="buffers", choices=BUFFER_PROFILES,
+        help="buffer sizes for the kind of traffic, so that responses don't spill to disk;"
+        " can be overridden with the proxy.buffers label"
+    )
+    parser.add_argument(
+        "--temp-path", dest="temp_path", metavar="DIR",
+        help="directory for the parts of requests and responses that don't fit in the"
+        " buffers, e.g. on a tmpfs like /dev/shm (default: next to the configuration)"
+    )
+    parser.add_argument(
+        "-i", dest="internal_ports", metavar="PORT", action="append", type=int,
+        help="internal container port to proxy, in order of preference; can be used multiple"
+        " times (default: 80)"
+    )
+    parser.add_argument(
+        "-e", dest="endpoints", metavar="ENDPOINT", action="append",
+        type=DockerEndpoint.from_cli_arg,
+        help="Docker context or daemon URL to list containers from, optionally followed by"
+        " =HOST for the host its containers are proxied to; can be used multiple times"
+        " (default: the current Docker context)"
+    )
+    parser.add_argument(
+        "--docker-timeout", dest="docker_timeout", metavar="SECONDS", type=float, default=10.0,
+        help="timeout in seconds for listing containers from a single Docker endpoint"
+    )
+    parser.add_argument(
+        "--engine", dest="engine", choices=("nginx", "asyncio"), default="nginx",
+        help="proxy implementation; asyncio runs a built-in proxy in the foreground"
+        " and reloads its routes on SIGHUP"
+    )
     parser.add_argument(
         "--dry-run", dest="dry_run", action="store_true",
         help="display generated configuration without saving it"
     )
+    parser.add_argument(
+        "--supervise", dest="supervise", action="store_true",
+        help="run nginx in the foreground, restart it if it exits and regenerate the"
+        " configuration on SIGHUP"
+    )
+    parser.add_argument(
+        "--dns-port", dest="dns_port", type=int, metavar="PORT",
+        help="answer DNS queries for the proxied host names on port, with --supervise or"
+        " the asyncio engine"
+    )
+    parser.add_argument(
+        "--dns-address", dest="dns_address", default="127.0.0.1", metavar="ADDRESS",
+        help="with --dns-port, address to listen on and to resolve the host names to"
+        " (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--no-cache", dest="use_cache", action="store_false",
+        help="don't reuse containers parsed by previous runs"
+    )
+    parser.add_argument(
+        "--strip-suffix", dest="name_rules", action="append", metavar="REGEX",
+        help="suffix to strip from container names of new containers, can be used multiple"
+        " times; defaults to numbers and -nginx"
+    )
+    parser.add_argument(
+        "--list", dest="list", action="store_true",
+        help="display URLs of the proxies set up by the last run, without querying Docker"
+    )
+    parser.add_argument(
+        "--json", dest="json", action="store_true",
+        help="with --list, display a JSON document with servers, containers and proxy state"
+    )
+    parser.add_argument(
+        "--max-age", dest="max_age", type=float, metavar="SECONDS",
+        help="with --list, fail if the last run is older than this"
+    )
     parser.add_argument("--help", action="help", help="show this help message and exit")
     args = parser.parse_args()
+    check_engine_args(args)
+    return args
+
+
+def check_engine_args(args: argparse.Namespace) -> None:
+    if args.tls_port is not None and args.engine == "asyncio":
+        sys.exit("the built-in proxy doesn't support TLS")
+    if args.supervise and args.engine == "asyncio":
+        sys.exit("the built-in proxy always runs in the foreground, --supervise is for nginx")
+    if args.supervise and not has_procfs():
+        sys.exit("--supervise finds the nginx worker processes in /proc, which only Linux has")
+    if args.dns_port is not None and not args.supervise and args.engine != "asyncio":
+        sys.exit("the DNS responder needs a process in the foreground, add --supervise")
+
+
+def report_convergence(
+    convergence: ConvergenceLog,
+    proxy: HTTPProxy,
+    reload_latency: Optional[float] = None,
+) -> None:
+    if reload_latency is not None:
+        convergence.record("reload", reload_latency)
+    dashboard_server = next(
+        server for server in proxy.servers if isinstance(server, DashboardServer)
+    )
+    with convergence.phase("verify"):
+        live = wait_for_generation(proxy.listen, dashboard_server)
+    if not live:
+        convergence.discard()
+        print("unable to verify that the new configuration is live", file=sys.stderr)
+        return
+    print(ConvergenceLog.summary(convergence.finish()))
+
+
+def list_proxies(snapshot_filename: str, as_json: bool, max_age: Optional[float]) -> None:
+    try:
+        snapshot = read_snapshot(snapshot_filename, max_age)
+    except SnapshotError as snapshot_error:
+        sys.exit(str(snapshot_error))
+    if as_json:
+        print(json.dumps(snapshot, indent=2))
+    else:
+        for server in snapshot["servers"]:
+            print(server["url"])
+
+
+class ContainerSource(Protocol):  # pylint: disable=too-few-public-methods; (a protocol)
+    # Where the containers to proxy come from, e.g. Docker or a list kept by the caller.
+
+    def list_containers(self) -> Iterable[DockerContainer]:
+        ...
+
+
+@dataclasses.dataclass(frozen=True)
+class DockerSource:
+    endpoints: tuple[DockerEndpoint, ...] = (DockerEndpoint(),)
+    timeout: Optional[float] = None
+    cache: Optional[GenerationCache] = dataclasses.field(default=None, compare=False)
+
+    def list_containers(self) -> Iterable[DockerContainer]:
+        return list_containers(self.endpoints, self.timeout, self.cache)
+
+
+@dataclasses.dataclass(frozen=True)
+class StaticSource:
+    # containers known to the caller, e.g. followed with Docker events
+    containers: tuple[DockerContainer, ...] = ()
+
+    def list_containers(self) -> Iterable[DockerContainer]:
+        return self.containers
+
+
+@dataclasses.dataclass(frozen=True)
+class Pipeline:
+    # The steps from containers to a validated proxy configuration, as run by
+    # main(), for use from other tools without starting a process for each run.
+
+    base_config: BaseProxyConfig
+    generator: Generator
+    internal_ports: tuple[int, ...] = (80,)
+    ip_version: IPVersion = IPVersion.V4
+    certificate: Optional[LocalCertificate] = None
+    temp_path: Optional[str] = None
+    # simplify_host_names by default, HostNameAllocator.allocate keeps names stable
+    simplify: Optional[Callable[[Sequence[str]], Iterable[str]]] = None
+
+    def servers(self, containers: Iterable[DockerContainer]) -> Iterator[HTTPProxyServer]:
+        # names are simplified together, so nothing is yielded before all containers are read
+        yield from simplify_proxy_host_names(
+            generate_proxies(containers, self.internal_ports, self.ip_version, self.base_config),
+            self.simplify,
+        )
+
+    def build(
+        self,
+        containers: Iterable[DockerContainer],
+        generation: str = "",
+        convergence: tuple[tuple[str, int], ...] = (),
+    ) -> HTTPProxy:
+        # raises InvalidLabelError or PortConflictError for a container that can't be
+        # proxied, ValueError if the servers conflict
+        proxy_servers = tuple(self.servers(containers))
+        dashboard_server = DashboardServer(
+            host_name=DashboardServer.HOST_NAME,
+            domain=self.base_config.domain,
+            listen=self.base_config.listen,
+            tls_listen=self.base_config.tls_listen,
+            proxy_servers=proxy_servers,
+            generation=generation,
+            convergence=convergence,
+        )
+        return HTTPProxy.from_config_generator(
+            self.base_config,
+            self.generator,
+            (dashboard_server,) + proxy_servers,
+            self.certificate,
+            self.temp_path,
+        )
+
+
+class ProxyModel:  # pylint: disable=too-many-instance-attributes; (optional state)
+    # A proxy generated by a Pipeline and kept in memory. Regenerating it lists
+    # the containers again, but builds a new proxy only if they have changed, so
+    # callers can tell a change by identity. With a GenerationCache, containers
+    # that didn't change are not parsed again; with a HostNameAllocator, host
+    # names are kept stable between runs; with a ConvergenceLog, the phases are
+    # timed and each proxy is marked with a generation, see wait_for_generation.
+
+    def __init__(
+        self,
+        pipeline: Pipeline,
+        source: ContainerSource,
+        cache: Optional[GenerationCache] = None,
+        names: Optional[HostNameAllocator] = None,
+        convergence: Optional[ConvergenceLog] = None,
+    ) -> None:
+        self.pipeline = (
+            pipeline if names is None else dataclasses.replace(pipeline, simplify=names.allocate)
+        )
+        self.source = source
+        self.cache = cache
+        self.names = names
+        self.convergence = convergence
+        self.containers: tuple[DockerContainer, ...] = ()
+        self.proxy: Optional[HTTPProxy] = None
+        self.lock = threading.Lock()
+
+    def phase(self, name: str) -> contextlib.AbstractContextManager[None]:
+        if self.convergence is None:
+            return contextlib.nullcontext()
+        return self.convergence.phase(name)
+
+    def discard(self) -> None:
+        # the phases of a failed regeneration don't belong to the next one
+        if self.convergence is not None:
+            self.convergence.discard()
+
+    def build(self, containers: tuple[DockerContainer, ...]) -> HTTPProxy:
+        if self.convergence is None:
+            return self.pipeline.build(containers)
+        return self.pipeline.build(
+            containers,
+            generation=f"{time.time():.6f}",
+            convergence=self.convergence.histogram() if self.convergence.entries else (),
+        )
+
+    def regenerate(self) -> HTTPProxy:
+        with self.lock:
+            try:
+                with self.phase("list"):
+                    containers = tuple(self.source.list_containers())
+                if self.proxy is None or containers != self.containers:
+                    with self.phase("generate"):
+                        self.proxy = self.build(containers)
+                    self.containers = containers
+            except Exception:
+                self.discard()
+                raise
+            return self.proxy
+
+    async def regenerate_async(self) -> HTTPProxy:
+        # listing containers blocks, the event loop is kept running in the meantime
+        return await asyncio.get_running_loop().run_in_executor(None, self.regenerate)
+
+    async def watch(self, interval: float) -> AsyncIterator[HTTPProxy]:
+        # yields the current proxy, then every changed one
+        previous = None
+        while True:
+            proxy = await self.regenerate_async()
+            if proxy is not previous:
+                previous = proxy
+                yield proxy
+            await asyncio.sleep(interval)
+
+    def current(self) -> HTTPProxy:
+        if self.proxy is None:
+            raise RuntimeError("nothing generated yet")
+        return self.proxy
+
+    def render(self) -> str:
+        return self.current().config()
+
+    def publish(self, check: Optional[Callable[[str], None]] = None) -> str:
+        # nothing is saved if check rejects the configuration, see Generator.write
+        proxy = self.current()
+        if proxy.temp_path is not None:
+            # nginx only creates the last directory of a temporary path
+            os.makedirs(proxy.temp_path, exist_ok=True)
+        try:
+            with self.phase("render"):
+                config = proxy.config()
+            with self.phase("write"):
+                config_filename = self.pipeline.generator.write(config, check)
+        except Exception:
+            self.discard()
+            raise
+        self.save("nginx")
+        return config_filename
+
+    def save(self, engine: str) -> None:
+        # the state kept between runs, and the snapshot read by --list
+        if self.cache:
+            self.cache.save()
+        if self.names:
+            self.names.save()
+        self.pipeline.generator.write_snapshot(self.current(), engine)
+
+
+class Regenerator:
+    # What main() keeps between regenerations: the options, a model of the
+    # proxy with the state saved under the generator path prefix, and the DNS
+    # responder.
+
+    def __init__(self, args: argparse.Namespace, generator: Generator) -> None:
+        self.args = args
+        self.convergence = ConvergenceLog.load(generator.convergence_file)
+        cache = GenerationCache.load(generator.cache_file) if args.use_cache else None
+        base_config = BaseProxyConfig.from_cli_args(args)
+        self.model = ProxyModel(
+            Pipeline(
+                base_config=base_config,
+                generator=generator,
+                internal_ports=tuple(args.internal_ports or (80,)),
+                certificate=(
+                    LocalCertificate.for_domain(generator.tls_path, base_config.domain)
+                    if base_config.tls_listen is not None else None
+                ),
+                temp_path=args.temp_path,
+            ),
+            DockerSource(tuple(args.endpoints or (DockerEndpoint(),)), args.docker_timeout, cache),
+            cache,
+            HostNameAllocator.load(
+                generator.names_file,
+                args.name_rules or HostNameAllocator.DEFAULT_RULES,
+            ),
+            # dry runs are left unmarked, so that their output can be compared
+            None if args.dry_run else self.convergence,
+        )
+        self.dns: Optional[DNSResponder] = None
+        # the proxy whose convergence was reported last
+        self.reported: Optional[HTTPProxy] = None
+
+    def regenerate_engine_routes(self) -> HTTPProxy:
+        proxy = self.model.regenerate()
+        self.model.save(self.args.engine)
+        return proxy
+
+    def republish(self, check: Callable[[str], None]) -> None:
+        self.model.regenerate()
+        print(f"configuration saved to {self.model.publish(check)}")
+
+    def reloaded(self, latency: Optional[float] = None) -> None:
+        # only now, a name resolving before nginx serves it would get an error page
+        if self.dns:
+            self.dns.update(self.model.current())
+        self.report(latency)
+
+    def started(self) -> None:
+        # the proxy started with is live without a reload, a SIGHUP finding the same
+        # containers has nothing to report, and the startup phases aren't part of one
+        self.reported = self.model.current()
+        self.convergence.discard()
+
+    def report(self, latency: Optional[float] = None) -> None:
+        # after nginx or the built-in proxy has loaded the routes
+        proxy = self.model.current()
+        if proxy is self.reported:
+            # the containers haven't changed, the generation was live already
+            self.convergence.discard()
+            return
+        self.reported = proxy
+        report_convergence(self.convergence, proxy, latency)
+        print("\n".join(self.convergence.histogram_lines()))
+
+
+def main() -> None:
+    args = parse_args()
     generator = Generator.from_script_name()
-    base_config = BaseProxyConfig.from_cli_args(args)
-    containers = list_containers()
-    proxy_servers = generate_proxies(containers, 80, IPVersion.V4, base_config)
-    proxy_servers = simplify_proxy_host_names(proxy_servers)
-    proxy_servers = tuple(proxy_servers)
-    dashboard_server = DashboardServer(
-        host_name="_dashboard",
-        domain=base_config.domain,
-        listen=base_config.listen,
-        proxy_servers=proxy_servers,
-    )
-    servers = (dashboard_server, ) + proxy_servers
-    proxy = HTTPProxy.from_config_generator(base_config, generator, servers)
+    if args.list:
+        list_proxies(generator.snapshot_file, args.json, args.max_age)
+        return
+    regenerator = Regenerator(args, generator)
+    certificate = regenerator.model.pipeline.certificate
+    if certificate is not None and not args.dry_run and certificate.ensure(args.domain):
+        print(f"certificate generated, trust {certificate.ca_certificate_file} in your browser")
+    proxy = regenerator.model.regenerate()
+    if args.dns_port is not None:
+        regenerator.dns = DNSResponder(proxy, args.dns_address)
+    if not args.dry_run:
+        for server in proxy.servers:
+            print(server.url)
     if args.dry_run:
         print(proxy.config(), end="")
+    elif args.engine == "asyncio":
+        print(f"serving with the built-in proxy (PID {os.getpid()})")
+        regenerator.model.save(args.engine)
+        regenerator.started()
+        run_engine(
+            proxy,
+            os.path.join(generator.path_prefix, "static"),
+            regenerator.regenerate_engine_routes,
+            (regenerator.dns, args.dns_port) if regenerator.dns else None,
+            regenerator.report,
+        )
     else:
-        for server in proxy.servers:
-            print(server.url)
-        config_filename = generator.write(proxy.config())
+        config_filename = regenerator.model.publish()
         print(f"configuration saved to {config_filename}")
-        restart_proxy(config_filename, proxy.pid_file)
-        print("proxy restarted")
+        if args.supervise:
+            if regenerator.dns:
+                regenerator.dns.serve_in_thread(args.dns_port)
+                print(f"answering DNS queries on {args.dns_address} port {args.dns_port}")
+            supervisor = NginxSupervisor(config_filename, proxy.pid_file)
+            regenerator.started()
+            supervisor.run(
+                functools.partial(regenerator.republish, supervisor.check_config),
+                regenerator.reloaded,
+            )
+        else:
+            with regenerator.convergence.phase("reload"):
+                restart_proxy(config_filename, proxy.pid_file)
+            print("proxy restarted")
+            regenerator.reloaded()
 
 
 if __name__ == "__main__":
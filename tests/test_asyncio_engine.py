@@ -0,0 +1,283 @@
+import asyncio
+import dataclasses
+import json
+import pathlib
+from typing import Awaitable, Callable
+from docker_container_proxy import DockerContainer, HTTPProxyServer, DashboardServer, HTTPProxy
+from docker_container_proxy import AsyncioProxyEngine, HTTPMessageHead, ProxyTuning
+
+
+class StubBackend:
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.connections = 0
+        self.port = 0
+
+    async def start(self) -> int:
+        server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        self.port = int(server.sockets[0].getsockname()[1])
+        return self.port
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        try:
+            while True:
+                request = await HTTPMessageHead.read(reader)
+                body = await reader.readexactly(int(request.header("content-length") or 0))
+                response_body = json.dumps({
+                    "backend": self.name,
+                    "request": request.start_line,
+                    "host": request.header("host"),
+                    "body": body.decode(),
+                }).encode()
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Length: %d\r\n\r\n%s"
+                    % (len(response_body), response_body)
+                )
+                await writer.drain()
+        except asyncio.IncompleteReadError:
+            writer.close()
+
+
+async def send_request(
+    port: int,
+    host: str,
+    method: str = "GET",
+    body: bytes = b"",
+    extra_headers: str = "",
+) -> tuple[int, bytes]:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(
+        f"{method} /path HTTP/1.1\r\nHost: {host}\r\nContent-Length: {len(body)}\r\n".encode()
+        + extra_headers.encode() + b"Connection: close\r\n\r\n" + body
+    )
+    response = await HTTPMessageHead.read(reader)
+    content = await reader.read()
+    writer.close()
+    return int(response.start_line.split(" ")[1]), content
+
+
+def create_proxy(ports: dict[str, int], tuning: ProxyTuning = ProxyTuning()) -> HTTPProxy:
+    proxy_servers = tuple(
+        HTTPProxyServer(
+            host_name=name,
+            domain="test",
+            listen=0,
+            proxied_host="127.0.0.1",
+            proxied_port=port,
+            docker_container=DockerContainer(name=name, ports=()),
+            tuning=tuning,
+        )
+        for name, port in ports.items()
+    )
+    dashboard_server = DashboardServer(
+        host_name="_dashboard",
+        domain="test",
+        listen=0,
+        proxy_servers=proxy_servers,
+    )
+    return HTTPProxy(
+        pid_file="unused.pid",
+        error_log_file="unused.log",
+        access_log_file="unused.log",
+        listen=0,
+        servers=(dashboard_server,) + proxy_servers,
+    )
+
+
+@dataclasses.dataclass
+class Harness:
+    engine: AsyncioProxyEngine
+    port: int
+    backends: dict[str, StubBackend]
+
+
+def run_with_engine(tmp_path: pathlib.Path, test: Callable[[Harness], Awaitable[None]]) -> None:
+
+    async def run() -> None:
+        backends = {name: StubBackend(name) for name in ("alpha", "beta")}
+        ports = {name: await backend.start() for name, backend in backends.items()}
+        engine = AsyncioProxyEngine(create_proxy(ports), str(tmp_path))
+        server = await engine.start("127.0.0.1")
+        try:
+            await test(Harness(engine, int(server.sockets[0].getsockname()[1]), backends))
+        finally:
+            server.close()
+            engine.pool.close()
+
+    asyncio.run(run())
+
+
+def test_routes_on_host_header(tmp_path: pathlib.Path) -> None:
+
+    async def test(harness: Harness) -> None:
+        status, content = await send_request(harness.port, "beta.test:8080")
+        assert status == 200
+        assert json.loads(content)["backend"] == "beta"
+        assert json.loads(content)["request"] == "GET /path HTTP/1.1"
+        assert json.loads(content)["host"] == f"127.0.0.1:{harness.backends['beta'].port}"
+
+    run_with_engine(tmp_path, test)
+
+
+def test_forwards_request_body(tmp_path: pathlib.Path) -> None:
+
+    async def test(harness: Harness) -> None:
+        status, content = await send_request(harness.port, "alpha.test", "POST", b"payload")
+        assert status == 200
+        assert json.loads(content)["body"] == "payload"
+
+    run_with_engine(tmp_path, test)
+
+
+def test_unknown_host(tmp_path: pathlib.Path) -> None:
+
+    async def test(harness: Harness) -> None:
+        status, _ = await send_request(harness.port, "gamma.test")
+        assert status == 400
+
+    run_with_engine(tmp_path, test)
+
+
+def test_dashboard(tmp_path: pathlib.Path) -> None:
+
+    async def test(harness: Harness) -> None:
+        status, content = await send_request(harness.port, "_dashboard.test")
+        assert status == 200
+        assert content.startswith(b"<!DOCTYPE html>")
+        assert b"alpha.test" in content
+
+    run_with_engine(tmp_path, test)
+
+
+def test_reuses_upstream_connections(tmp_path: pathlib.Path) -> None:
+
+    async def test(harness: Harness) -> None:
+        for _ in range(5):
+            status, _ = await send_request(harness.port, "alpha.test")
+            assert status == 200
+        assert harness.backends["alpha"].connections == 1
+
+    run_with_engine(tmp_path, test)
+
+
+def test_hot_update_keeps_client_connection(tmp_path: pathlib.Path) -> None:
+
+    async def test(harness: Harness) -> None:
+        reader, writer = await asyncio.open_connection("127.0.0.1", harness.port)
+
+        async def get(host: str) -> int:
+            writer.write(f"GET / HTTP/1.1\r\nHost: {host}\r\n\r\n".encode())
+            response = await HTTPMessageHead.read(reader)
+            await reader.readexactly(int(response.header("content-length") or 0))
+            return int(response.start_line.split(" ")[1])
+
+        assert await get("alpha.test") == 200
+        assert await get("beta.test") == 200
+        harness.engine.update(create_proxy({"alpha": harness.backends["alpha"].port}))
+        assert await get("alpha.test") == 200
+        assert await get("beta.test") == 400
+        writer.close()
+
+    run_with_engine(tmp_path, test)
+
+
+def test_upstream_down(tmp_path: pathlib.Path) -> None:
+
+    async def test(harness: Harness) -> None:
+        harness.engine.update(create_proxy({"alpha": harness.backends["alpha"].port, "beta": 1}))
+        status, _ = await send_request(harness.port, "beta.test")
+        assert status == 502
+
+    run_with_engine(tmp_path, test)
+
+
+def test_oversized_upstream_head(tmp_path: pathlib.Path) -> None:
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        await HTTPMessageHead.read(reader)
+        writer.write(b"HTTP/1.1 200 OK\r\nX-Padding: " + b"a" * 100000 + b"\r\n\r\n")
+        await writer.drain()
+        writer.close()
+
+    async def test(harness: Harness) -> None:
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        port = int(server.sockets[0].getsockname()[1])
+        harness.engine.update(create_proxy({"alpha": harness.backends["alpha"].port, "beta": port}))
+        status, _ = await send_request(harness.port, "beta.test")
+        assert status == 502
+        server.close()
+
+    run_with_engine(tmp_path, test)
+
+
+def test_stalled_upstream_head(tmp_path: pathlib.Path) -> None:
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        await HTTPMessageHead.read(reader)
+        await reader.read()
+        writer.close()
+
+    async def test(harness: Harness) -> None:
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        port = int(server.sockets[0].getsockname()[1])
+        harness.engine.update(create_proxy(
+            {"alpha": harness.backends["alpha"].port, "beta": port},
+            ProxyTuning(read_timeout="100ms"),
+        ))
+        status, _ = await send_request(harness.port, "beta.test")
+        assert status == 504
+        server.close()
+
+    run_with_engine(tmp_path, test)
+
+
+def test_stalled_upstream_body_closes_both_connections(tmp_path: pathlib.Path) -> None:
+    upstream_closed = asyncio.Event()
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        await HTTPMessageHead.read(reader)
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 10\r\n\r\nhalf")
+        await writer.drain()
+        # the rest of the body never comes
+        assert await reader.read() == b""
+        upstream_closed.set()
+        writer.close()
+
+    async def test(harness: Harness) -> None:
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        port = int(server.sockets[0].getsockname()[1])
+        harness.engine.update(create_proxy(
+            {"alpha": harness.backends["alpha"].port, "beta": port},
+            ProxyTuning(read_timeout="100ms"),
+        ))
+        status, content = await send_request(harness.port, "beta.test")
+        assert (status, content) == (200, b"half")
+        await asyncio.wait_for(upstream_closed.wait(), 1)
+        assert not any(harness.engine.pool.idle.values())
+        server.close()
+
+    run_with_engine(tmp_path, test)
+
+
+def test_rejects_ambiguous_request_length(tmp_path: pathlib.Path) -> None:
+
+    async def test(harness: Harness) -> None:
+        status, _ = await send_request(
+            harness.port, "alpha.test", "POST", b"0\r\n\r\n", "Transfer-Encoding: chunked\r\n",
+        )
+        assert status == 400
+        assert harness.backends["alpha"].connections == 0
+
+    run_with_engine(tmp_path, test)
+
+
+def test_forwarded_drops_length_of_chunked_message() -> None:
+    head = HTTPMessageHead(
+        start_line="HTTP/1.1 200 OK",
+        headers=(("Content-Length", "10"), ("Transfer-Encoding", "chunked")),
+    )
+    assert head.forwarded(head.start_line, ()) == (
+        b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n"
+    )
@@ -0,0 +1,48 @@
+import pytest
+from docker_container_proxy import BaseProxyConfig, DockerContainer, Generator, HTTPProxy
+from docker_container_proxy import HTTPProxyServer, ProxyTuning, InvalidLabelError
+
+
+def create_proxy(tuning: ProxyTuning, temp_path: str = "") -> HTTPProxy:
+    config = BaseProxyConfig(listen=8900, proxy_host="10.1.1.1", domain="assets.local")
+    server = HTTPProxyServer(
+        host_name="cdn",
+        domain=config.domain,
+        listen=config.listen,
+        proxied_host=config.proxy_host,
+        proxied_port=9100,
+        docker_container=DockerContainer(name="cdn-1", ports=()),
+        tuning=tuning,
+    )
+    generator = Generator(name="buffers", path_prefix="/home/dev/.local/share/proxy")
+    return HTTPProxy.from_config_generator(config, generator, (server,), temp_path=temp_path)
+
+
+def test_temp_paths_under_path_prefix() -> None:
+    config = create_proxy(ProxyTuning()).config()
+    for module in ("client_body", "proxy", "fastcgi", "uwsgi", "scgi"):
+        assert f"    {module}_temp_path /home/dev/.local/share/proxy/{module}_temp;\n" in config
+
+
+def test_temp_paths_elsewhere() -> None:
+    config = create_proxy(ProxyTuning(), temp_path="/dev/shm/proxy").config()
+    assert "    proxy_temp_path /dev/shm/proxy/proxy_temp;\n" in config
+    assert "/home/dev/.local/share/proxy/proxy_temp" not in config
+
+
+@pytest.mark.parametrize(
+    "profile,expected_directive",
+    [
+        pytest.param("api", "client_body_buffer_size 128k;", id="api"),
+        pytest.param("assets", "proxy_buffers 64 64k;", id="assets"),
+    ]
+)
+def test_buffer_profiles(profile: str, expected_directive: str) -> None:
+    tuning = ProxyTuning.from_labels({"proxy.buffers": profile})
+    assert tuning == ProxyTuning(buffers=profile)
+    assert f"        {expected_directive}\n" in create_proxy(tuning).config()
+
+
+def test_unknown_buffer_profile() -> None:
+    with pytest.raises(InvalidLabelError):
+        ProxyTuning.from_labels({"proxy.buffers": "huge"})
@@ -0,0 +1,160 @@
+import asyncio
+import http.server
+import pathlib
+import sys
+import threading
+from typing import Iterator
+import pytest
+from benchmarks.nginx_load import free_port
+import docker_container_proxy
+from docker_container_proxy import AsyncioProxyEngine, ConvergenceLog, DashboardServer
+from docker_container_proxy import DockerContainer, Generator, IPVersion, PortMapping
+from docker_container_proxy import Regenerator, StaticSource, parse_args, wait_for_generation
+
+# pylint: disable=redefined-outer-name; (for pytest fixtures)
+
+
+class DashboardHandler(http.server.BaseHTTPRequestHandler):
+    page = b""
+
+    def do_GET(self) -> None:  # pylint: disable=invalid-name; (http.server API)
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(self.page)))
+        self.end_headers()
+        self.wfile.write(self.page)
+
+    def log_message(self, *_: object) -> None:
+        pass
+
+
+@pytest.fixture
+def dashboard_port() -> Iterator[int]:
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), DashboardHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield int(server.server_address[1])
+    server.shutdown()
+
+
+def create_dashboard(port: int, generation: str) -> DashboardServer:
+    return DashboardServer(
+        host_name="_status",
+        domain="box",
+        listen=port,
+        proxy_servers=(),
+        generation=generation,
+    )
+
+
+def test_waits_for_generation(dashboard_port: int) -> None:
+    DashboardHandler.page = create_dashboard(dashboard_port, "17.5").html().encode()
+    assert wait_for_generation(dashboard_port, create_dashboard(dashboard_port, "17.5"))
+    assert not wait_for_generation(
+        dashboard_port, create_dashboard(dashboard_port, "18.5"), timeout=0.1
+    )
+
+
+def test_records_phases_and_histogram(tmp_path: pathlib.Path) -> None:
+    path = str(tmp_path / "convergence.json")
+    log = ConvergenceLog.load(path)
+    with log.phase("list"):
+        pass
+    log.record("reload", 0.3)
+    entry = log.finish()
+    assert set(entry) == {"list", "reload", "total"}
+    assert entry["total"] >= 0.3
+    assert "reload 300 ms" in ConvergenceLog.summary(entry)
+
+    log.record("reload", 12.0)
+    log.finish()
+    histogram = dict(ConvergenceLog.load(path).histogram())
+    assert histogram["up to 0.5"] == 1
+    assert histogram["over 10"] == 1
+    assert sum(histogram.values()) == 2
+
+
+def test_discarded_phases_are_not_kept(tmp_path: pathlib.Path) -> None:
+    log = ConvergenceLog(str(tmp_path / "convergence.json"))
+    log.record("write", 0.01)
+    log.discard()
+    log.record("verify", 0.02)
+    assert set(log.finish()) == {"verify", "total"}
+
+
+def test_dashboard_shows_histogram() -> None:
+    dashboard = DashboardServer(
+        host_name="_overview",
+        domain="lan",
+        listen=8500,
+        proxy_servers=(),
+        convergence=(("up to 0.1", 4), ("up to 0.25", 2)),
+    )
+    html = dashboard.html()
+    assert "<td>up to 0.1</td><td>4</td><td>" + "#" * 40 + "</td>" in html
+    assert "<td>up to 0.25</td><td>2</td><td>" + "#" * 20 + "</td>" in html
+    assert "'" not in dashboard.config().split("return 200 '")[1].rsplit("';", 1)[0]
+
+
+def test_engine_routes_are_verified(
+    tmp_path: pathlib.Path,
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    port = free_port()
+    monkeypatch.setattr(
+        sys, "argv", ["docker_container_proxy.py", "--engine", "asyncio", "-p", str(port)],
+    )
+    generator = Generator(name="engine test", path_prefix=str(tmp_path))
+    regenerator = Regenerator(parse_args(), generator)
+    regenerator.model.source = StaticSource()
+    proxy = regenerator.model.regenerate()
+
+    async def reload() -> None:
+        loop = asyncio.get_running_loop()
+        engine = AsyncioProxyEngine(proxy, str(tmp_path / "static"))
+        async with await engine.start("127.0.0.1"):
+            regenerator.model.source = StaticSource((DockerContainer(
+                name="whoami",
+                ports=(PortMapping(exposed=32768, internal=80, ip_version=IPVersion.V4),),
+            ),))
+            engine.update(await loop.run_in_executor(None, regenerator.regenerate_engine_routes))
+            await loop.run_in_executor(None, regenerator.report, 0.001)
+            # unchanged containers, nothing to converge
+            await loop.run_in_executor(None, regenerator.regenerate_engine_routes)
+            await loop.run_in_executor(None, regenerator.report, 0.001)
+
+    asyncio.run(reload())
+    assert len(regenerator.convergence.entries) == 1
+    assert set(regenerator.convergence.entries[0]) == {
+        "list", "generate", "reload", "verify", "total",
+    }
+    output = capsys.readouterr().out
+    assert "route live" in output
+    assert "up to 0.1 s" in output
+
+
+def test_unchanged_containers_after_start_are_not_reported(
+    tmp_path: pathlib.Path,
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    monkeypatch.setattr(sys, "argv", ["docker_container_proxy.py", "--supervise"])
+    # a report would find the generation live
+    monkeypatch.setattr(docker_container_proxy, "wait_for_generation", lambda *_: True)
+    generator = Generator(name="startup test", path_prefix=str(tmp_path))
+    regenerator = Regenerator(parse_args(), generator)
+    regenerator.model.source = StaticSource((DockerContainer(
+        name="whoami",
+        ports=(PortMapping(exposed=32768, internal=80, ip_version=IPVersion.V4),),
+    ),))
+    regenerator.model.regenerate()
+    regenerator.model.publish()
+    regenerator.started()
+
+    # the first SIGHUP, with the same containers
+    regenerator.republish(lambda _: None)
+    regenerator.reloaded(0.001)
+
+    assert not regenerator.convergence.entries
+    assert not regenerator.convergence.current
+    assert "route live" not in capsys.readouterr().out
@@ -0,0 +1,112 @@
+import asyncio
+import pathlib
+import socket
+import struct
+import sys
+from typing import Any, Tuple, Union
+import pytest
+from benchmarks.dns import build_query
+from benchmarks.load import build_proxy
+import docker_container_proxy
+from docker_container_proxy import DNSResponder, DockerContainer, Generator, IPVersion
+from docker_container_proxy import PortMapping, Regenerator, StaticSource, parse_args
+
+
+class Resolver(asyncio.DatagramProtocol):
+
+    def __init__(self) -> None:
+        self.response: asyncio.Future[bytes] = asyncio.get_running_loop().create_future()
+
+    def datagram_received(self, data: bytes, addr: Tuple[Union[str, Any], int]) -> None:
+        self.response.set_result(data)
+
+
+def response_code(response: bytes) -> int:
+    return int(struct.unpack("!H", response[2:4])[0]) & 0x000f
+
+
+def answer_count(response: bytes) -> int:
+    return int(struct.unpack("!H", response[6:8])[0])
+
+
+def test_answers_proxied_names() -> None:
+    responder = DNSResponder(build_proxy([7001, 7002], listen=8300), "127.0.0.1")
+    response = responder.respond(build_query("Backend-1.test", query_id=4242))
+    assert response is not None
+    assert response[:2] == struct.pack("!H", 4242)
+    assert response_code(response) == 0
+    assert answer_count(response) == 1
+    assert response.endswith(socket.inet_aton("127.0.0.1"))
+
+
+def test_unknown_names() -> None:
+    responder = DNSResponder(build_proxy([7003], listen=8301), "127.0.0.1")
+    for name in ("backend-9.test", "example.com"):
+        response = responder.respond(build_query(name))
+        assert response is not None
+        assert response_code(response) == 3
+        assert answer_count(response) == 0
+
+
+def test_other_record_types_and_families() -> None:
+    proxy = build_proxy([7004], listen=8302)
+    aaaa_response = DNSResponder(proxy, "127.0.0.1").respond(build_query("backend-0.test", 28))
+    assert aaaa_response is not None
+    assert (response_code(aaaa_response), answer_count(aaaa_response)) == (0, 0)
+    v6_response = DNSResponder(proxy, "::1").respond(build_query("backend-0.test", 28))
+    assert v6_response is not None
+    assert v6_response.endswith(socket.inet_pton(socket.AF_INET6, "::1"))
+
+
+def test_ignores_malformed_queries() -> None:
+    responder = DNSResponder(build_proxy([7005], listen=8303), "127.0.0.1")
+    assert responder.respond(b"\x00\x01") is None
+    assert responder.respond(build_query("backend-0.test")[:-3]) is None
+    assert responder.queries == 0
+
+
+def test_updates_over_udp() -> None:
+
+    async def resolve(port: int, name: str) -> bytes:
+        client, resolver = await asyncio.get_running_loop().create_datagram_endpoint(
+            Resolver,
+            remote_addr=("127.0.0.1", port),
+        )
+        client.sendto(build_query(name))
+        try:
+            return await asyncio.wait_for(resolver.response, 2)
+        finally:
+            client.close()
+
+    async def run() -> None:
+        responder = DNSResponder(build_proxy([7006], listen=8304), "127.0.0.1")
+        transport = await responder.start(0)
+        port = transport.get_extra_info("sockname")[1]
+        assert response_code(await resolve(port, "backend-1.test")) == 3
+        responder.update(build_proxy([7006, 7007], listen=8304))
+        assert response_code(await resolve(port, "backend-1.test")) == 0
+        transport.close()
+
+    asyncio.run(run())
+
+
+def test_supervisor_updates_names_after_reload(
+    tmp_path: pathlib.Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(
+        sys, "argv", ["docker_container_proxy.py", "--supervise", "--dns-port", "0"],
+    )
+    monkeypatch.setattr(docker_container_proxy, "wait_for_generation", lambda *_: True)
+    regenerator = Regenerator(parse_args(), Generator(name="dns test", path_prefix=str(tmp_path)))
+    regenerator.model.source = StaticSource()
+    regenerator.dns = DNSResponder(regenerator.model.regenerate(), "127.0.0.1")
+    regenerator.model.source = StaticSource((DockerContainer(
+        name="whoami",
+        ports=(PortMapping(exposed=32768, internal=80, ip_version=IPVersion.V4),),
+    ),))
+
+    regenerator.republish(lambda _: None)
+    assert "whoami.test" not in regenerator.dns.names
+    regenerator.reloaded(0.01)
+    assert "whoami.test" in regenerator.dns.names
@@ -22,6 +22,14 @@ def test_no_duplicate() -> None:
             proxied_port=3,
             docker_container=DockerContainer(name="c", ports=()),
         ),
+        HTTPProxyServer(
+            host_name="l",
+            domain="d",
+            listen=1,
+            proxied_host="q",
+            proxied_port=3,
+            docker_container=DockerContainer(name="c", ports=()),
+        ),
     )
     dashboard = DashboardServer(
         host_name="k",
@@ -71,12 +79,12 @@ def test_no_duplicate() -> None:
                     host_name="g",
                     domain="b",
                     listen=5,
-                    proxied_host="q",
+                    proxied_host="p",
                     proxied_port=2,
                     docker_container=DockerContainer(name="l", ports=()),
                 ),
             ],
-            "proxied port 2",
+            "proxied address p:2",
         ),
         (
             [
@@ -0,0 +1,84 @@
+import json
+import pathlib
+from docker_container_proxy import DockerContainer, PortMapping, IPVersion
+from docker_container_proxy import GenerationCache, parse_containers
+
+
+def docker_ps_line(container_id: str, name: str, ports: str = "0.0.0.0:8000->80/tcp") -> bytes:
+    return json.dumps({
+        "ID": container_id,
+        "CreatedAt": "2024-01-01 12:00:00 +0000 UTC",
+        "Names": name,
+        "Ports": ports,
+        "Labels": "proxy.gzip=on",
+    }).encode()
+
+
+def test_reuses_parsed_containers(tmp_path: pathlib.Path) -> None:
+    output = docker_ps_line("a1", "alpha") + b"\n" + docker_ps_line("b2", "beta")
+    cache = GenerationCache(str(tmp_path / "cache.json"))
+    first = list(parse_containers(output, cache))
+    cache.save()
+
+    cache = GenerationCache.load(str(tmp_path / "cache.json"))
+    second = list(parse_containers(output, cache))
+
+    assert second == first
+    assert second[0] == DockerContainer(
+        name="alpha",
+        ports=(PortMapping(exposed=8000, internal=80, ip_version=IPVersion.V4),),
+        labels=(("proxy.gzip", "on"),),
+        container_id="a1",
+        created_at="2024-01-01 12:00:00 +0000 UTC",
+    )
+    assert (cache.hits, cache.misses) == (2, 0)
+
+
+def test_changed_record_is_parsed_again(tmp_path: pathlib.Path) -> None:
+    cache = GenerationCache(str(tmp_path / "cache.json"))
+    list(parse_containers(docker_ps_line("a1", "alpha"), cache))
+    changed = list(parse_containers(docker_ps_line("a1", "alpha", "0.0.0.0:9000->80/tcp"), cache))
+    original = list(parse_containers(docker_ps_line("a1", "alpha"), cache))
+
+    assert changed[0].ports[0].exposed == 9000
+    assert original[0].ports[0].exposed == 8000
+    assert cache.hits == 0
+
+
+def test_evicts_stale_entries(tmp_path: pathlib.Path) -> None:
+    output = docker_ps_line("a1", "alpha") + b"\n" + docker_ps_line("b2", "beta")
+    cache = GenerationCache(str(tmp_path / "cache.json"))
+    list(parse_containers(output, cache))
+    cache.save()
+
+    cache = GenerationCache.load(str(tmp_path / "cache.json"))
+    list(parse_containers(docker_ps_line("b2", "beta"), cache))
+    cache.save()
+
+    assert list(GenerationCache.load(str(tmp_path / "cache.json")).entries) == [
+        "b2@2024-01-01 12:00:00 +0000 UTC",
+    ]
+
+
+def test_evicts_gone_containers_between_listings(tmp_path: pathlib.Path) -> None:
+    # the same object, as kept by --supervise and ProxyModel
+    output = docker_ps_line("a1", "alpha") + b"\n" + docker_ps_line("b2", "beta")
+    cache = GenerationCache(str(tmp_path / "cache.json"))
+    list(parse_containers(output, cache))
+    cache.save()
+    cache.reset()
+    list(parse_containers(docker_ps_line("a1", "alpha"), cache))
+    cache.save()
+
+    assert list(GenerationCache.load(str(tmp_path / "cache.json")).entries) == [
+        "a1@2024-01-01 12:00:00 +0000 UTC",
+    ]
+
+
+def test_ignores_invalid_cache_file(tmp_path: pathlib.Path) -> None:
+    (tmp_path / "cache.json").write_text("{not json", encoding="utf-8")
+    assert not GenerationCache.load(str(tmp_path / "cache.json")).entries
+    (tmp_path / "cache.json").write_text('{"version": 0, "entries": {}}', encoding="utf-8")
+    assert not GenerationCache.load(str(tmp_path / "cache.json")).entries
+    (tmp_path / "cache.json").write_text('{"version": 1, "entries": {}}', encoding="utf-8")
+    assert not GenerationCache.load(str(tmp_path / "cache.json")).entries
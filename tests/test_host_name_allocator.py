@@ -0,0 +1,92 @@
+import pathlib
+from typing import List
+import pytest
+from docker_container_proxy import HostNameAllocator
+
+
+@pytest.mark.parametrize(
+    "input_names,expected_host_names",
+    [
+        pytest.param(
+            ["shop-web-1", "shop-db-1", "cache-nginx"],
+            ["shop-web", "shop-db", "cache"],
+            id="all suffixes stripped",
+        ),
+        pytest.param(
+            ["worker-1", "worker-2", "mail-1"],
+            ["worker-1", "worker-2", "mail"],
+            id="only the names that stay unique",
+        ),
+        pytest.param(
+            ["site", "site-3"],
+            ["site", "site-3"],
+            id="stripped name taken by another container",
+        ),
+        pytest.param(
+            ["blog-nginx-7"],
+            ["blog"],
+            id="rules applied in turn",
+        ),
+    ]
+)
+def test_first_allocation(
+    tmp_path: pathlib.Path,
+    input_names: List[str],
+    expected_host_names: List[str],
+) -> None:
+    allocator = HostNameAllocator(str(tmp_path / "names.json"))
+    assert list(allocator.allocate(input_names)) == expected_host_names
+
+
+def test_new_container_doesnt_rename_others(tmp_path: pathlib.Path) -> None:
+    path = str(tmp_path / "names.json")
+    first = HostNameAllocator.load(path)
+    assert first.allocate(["app-1", "db-1"]) == ("app", "db")
+    first.save()
+
+    second = HostNameAllocator.load(path)
+    assert second.allocate(["app-1", "db-1", "app-2"]) == ("app", "db", "app-2")
+
+
+def test_full_name_taken_by_known_container(tmp_path: pathlib.Path) -> None:
+    path = str(tmp_path / "names.json")
+    first = HostNameAllocator.load(path)
+    assert first.allocate(["queue-1"]) == ("queue",)
+    first.save()
+
+    assert HostNameAllocator.load(path).allocate(["queue", "queue-1"]) == ("queue-2", "queue")
+
+
+def test_gone_container_keeps_name_until_taken(tmp_path: pathlib.Path) -> None:
+    path = str(tmp_path / "names.json")
+    allocator = HostNameAllocator.load(path)
+    allocator.allocate(["docs-1", "api-1"])
+    allocator.save()
+
+    allocator = HostNameAllocator.load(path)
+    assert allocator.allocate(["api-1"]) == ("api",)
+    allocator.save()
+    assert HostNameAllocator.load(path).allocate(["docs-1", "api-1"]) == ("docs", "api")
+
+    allocator = HostNameAllocator.load(path)
+    assert allocator.allocate(["docs-2", "api-1"]) == ("docs", "api")
+    allocator.save()
+    assert HostNameAllocator.load(path).allocate(["docs-1", "docs-2"]) == ("docs-1", "docs")
+
+
+def test_custom_rules(tmp_path: pathlib.Path) -> None:
+    allocator = HostNameAllocator(str(tmp_path / "names.json"), rules=(r"_[a-z]+",))
+    assert allocator.allocate(["cms_dev", "wiki-1"]) == ("cms", "wiki-1")
+
+
+def test_ignores_unreadable_file(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "names.json"
+    path.write_text("{not json", encoding="utf-8")
+    assert HostNameAllocator.load(str(path)).allocate(["store-1"]) == ("store",)
+
+
+def test_same_allocator_after_save(tmp_path: pathlib.Path) -> None:
+    allocator = HostNameAllocator(str(tmp_path / "names.json"))
+    assert allocator.allocate(["jobs-1"]) == ("jobs",)
+    allocator.save()
+    assert allocator.allocate(["jobs-1", "jobs-2"]) == ("jobs", "jobs-2")
@@ -0,0 +1,110 @@
+import json
+import pathlib
+from docker_container_proxy import IPVersion, BaseProxyConfig, DockerContainer, PortMapping
+from docker_container_proxy import HostNameAllocator, generate_proxies, parse_containers
+from docker_container_proxy import simplify_proxy_host_names
+
+
+def create_container(
+    name: str,
+    internal_ports: tuple[int, ...],
+    labels: tuple[tuple[str, str], ...] = (),
+) -> DockerContainer:
+    return DockerContainer(
+        name=name,
+        ports=tuple(
+            PortMapping(exposed=30000 + port, internal=port, ip_version=IPVersion.V4)
+            for port in internal_ports
+        ),
+        labels=labels,
+    )
+
+
+def test_picks_preferred_port() -> None:
+    containers = (
+        create_container("node-app", (3000, 9229)),
+        create_container("django-app", (8000, 3000)),
+        create_container("database", (5432,)),
+    )
+    config = BaseProxyConfig(listen=8080, proxy_host="localhost", domain="test")
+
+    servers = list(generate_proxies(containers, (8000, 3000), IPVersion.V4, config))
+
+    assert [(server.host_name, server.proxied_port) for server in servers] == [
+        ("node-app", 33000),
+        ("django-app", 38000),
+    ]
+
+
+def test_label_ports_get_distinct_host_names() -> None:
+    containers = (
+        create_container("api", (8080, 9090, 80), (("proxy.ports", "8080,9090,7000"),)),
+        create_container("web", (80,)),
+    )
+    config = BaseProxyConfig(listen=8000, proxy_host="localhost", domain="test")
+
+    servers = list(generate_proxies(containers, (80,), IPVersion.V4, config))
+
+    assert [(server.host_name, server.proxied_port) for server in servers] == [
+        ("api", 38080),
+        ("api-9090", 39090),
+        ("web", 30080),
+    ]
+
+
+def test_simplification_keeps_port_suffixes() -> None:
+    containers = (
+        create_container("api-nginx-1", (8080, 9090), (("proxy.ports", "8080,9090"),)),
+        create_container("web-nginx-1", (80,)),
+    )
+    config = BaseProxyConfig(listen=8000, proxy_host="localhost", domain="test")
+
+    servers = simplify_proxy_host_names(generate_proxies(containers, (80,), IPVersion.V4, config))
+
+    assert [server.host_name for server in servers] == ["api", "api-9090", "web"]
+
+
+def test_port_host_name_taken_by_container() -> None:
+    containers = (
+        create_container("app", (3000, 8080), (("proxy.ports", "3000,8080"),)),
+        create_container("app-8080", (80,)),
+    )
+    config = BaseProxyConfig(listen=8000, proxy_host="localhost", domain="test")
+
+    servers = simplify_proxy_host_names(generate_proxies(containers, (80,), IPVersion.V4, config))
+
+    assert [server.host_name for server in servers] == ["app", "app-8080-2", "app-8080"]
+
+
+def test_port_host_names_are_kept(tmp_path: pathlib.Path) -> None:
+    allocator = HostNameAllocator(str(tmp_path / "names.json"))
+    config = BaseProxyConfig(listen=8000, proxy_host="localhost", domain="test")
+    app = create_container("app-1", (3000, 8080), (("proxy.ports", "3000,8080"),))
+
+    servers = simplify_proxy_host_names(
+        generate_proxies((app,), (80,), IPVersion.V4, config), allocator.allocate,
+    )
+    assert [server.host_name for server in servers] == ["app", "app-8080"]
+    allocator.save()
+
+    servers = simplify_proxy_host_names(
+        generate_proxies((app, create_container("app-8080", (80,))), (80,), IPVersion.V4, config),
+        allocator.allocate,
+    )
+    assert [server.host_name for server in servers] == ["app", "app-8080", "app-8080-2"]
+
+
+def test_ports_label_from_docker_ps() -> None:
+    record = json.dumps({
+        "Names": "api",
+        "Ports": "0.0.0.0:8100->3000/tcp, 0.0.0.0:8101->9229/tcp",
+        "Labels": "com.docker.compose.project=api,proxy.ports=3000,9229,proxy.gzip=on",
+    }).encode()
+    config = BaseProxyConfig(listen=8000, proxy_host="localhost", domain="test")
+
+    servers = list(generate_proxies(parse_containers(record), (80,), IPVersion.V4, config))
+
+    assert [(server.host_name, server.proxied_port) for server in servers] == [
+        ("api", 8100),
+        ("api-9229", 8101),
+    ]
@@ -0,0 +1,145 @@
+import asyncio
+import dataclasses
+import pathlib
+import subprocess
+from typing import Iterable, List, Tuple
+import pytest
+from docker_container_proxy import BaseProxyConfig, DockerContainer, PortMapping, IPVersion
+from docker_container_proxy import DashboardServer, Generator, GenerationCache, HTTPProxyServer
+from docker_container_proxy import HostNameAllocator, Pipeline, ProxyModel, StaticSource
+from docker_container_proxy import ConvergenceLog, PortConflictError
+
+
+def container(name: str, exposed: int) -> DockerContainer:
+    return DockerContainer(
+        name=name,
+        ports=(PortMapping(exposed=exposed, internal=80, ip_version=IPVersion.V4),),
+        container_id=name + "-id",
+    )
+
+
+@dataclasses.dataclass
+class CountingSource:
+    containers: Tuple[DockerContainer, ...]
+    calls: int = 0
+
+    def list_containers(self) -> Iterable[DockerContainer]:
+        self.calls += 1
+        return self.containers
+
+
+def create_pipeline(tmp_path: pathlib.Path) -> Pipeline:
+    return Pipeline(
+        base_config=BaseProxyConfig(listen=9090, proxy_host="172.17.0.1", domain="lab"),
+        generator=Generator(name="library test", path_prefix=str(tmp_path)),
+    )
+
+
+def test_pipeline_builds_validated_proxy(tmp_path: pathlib.Path) -> None:
+    pipeline = create_pipeline(tmp_path)
+    containers = (container("grafana-1", 3000), container("loki-1", 3100))
+
+    server_names: List[str] = [server.server_name for server in pipeline.servers(containers)]
+    assert server_names == ["grafana.lab", "loki.lab"]
+
+    proxy = pipeline.build(containers)
+    assert isinstance(proxy.servers[0], DashboardServer)
+    assert all(isinstance(server, HTTPProxyServer) for server in proxy.servers[1:])
+    assert proxy.temp_path == str(tmp_path)
+    with pytest.raises(PortConflictError):
+        pipeline.build((container("grafana-1", 9090),))
+
+
+def test_pipeline_with_stable_names(tmp_path: pathlib.Path) -> None:
+    names = HostNameAllocator(str(tmp_path / "names.json"))
+    pipeline = dataclasses.replace(create_pipeline(tmp_path), simplify=names.allocate)
+    pipeline.build((container("loki-1", 3100),))
+    names.save()
+    proxy = pipeline.build((container("loki-1", 3100), container("loki-2", 3200)))
+    assert [server.host_name for server in proxy.servers] == ["_dashboard", "loki", "loki-2"]
+
+
+def test_model_regenerates_on_change(tmp_path: pathlib.Path) -> None:
+    source = CountingSource((container("tempo-1", 3200),))
+    model = ProxyModel(create_pipeline(tmp_path), source)
+
+    first = model.regenerate()
+    assert model.regenerate() is first
+    source.containers += (container("mimir-1", 9009),)
+    second = model.regenerate()
+    assert second is not first
+    assert [server.host_name for server in second.servers][1:] == ["tempo", "mimir"]
+    assert source.calls == 3
+
+
+def test_model_renders_and_publishes(tmp_path: pathlib.Path) -> None:
+    cache = GenerationCache(str(tmp_path / "cache.json"))
+    model = ProxyModel(
+        create_pipeline(tmp_path),
+        StaticSource((container("prometheus-1", 9091),)),
+        cache,
+    )
+    with pytest.raises(RuntimeError):
+        model.render()
+    model.regenerate()
+    config_filename = model.publish()
+    with open(config_filename, "r", encoding="utf-8") as config_file:
+        assert "server_name prometheus.lab;" in config_file.read()
+    assert (tmp_path / "cache.json").exists()
+
+
+def test_model_watch(tmp_path: pathlib.Path) -> None:
+    source = CountingSource((container("alloy-1", 12345),))
+    model = ProxyModel(create_pipeline(tmp_path), source)
+
+    async def watch() -> List[int]:
+        counts = []
+        async for proxy in model.watch(0.01):
+            counts.append(len(proxy.servers))
+            if len(counts) == 2:
+                break
+            source.containers += (container("pyroscope-1", 4040),)
+        return counts
+
+    assert asyncio.run(watch()) == [2, 3]
+
+
+def test_model_keeps_state_and_marks_generations(tmp_path: pathlib.Path) -> None:
+    names = HostNameAllocator(str(tmp_path / "names.json"))
+    convergence = ConvergenceLog(str(tmp_path / "convergence.json"))
+    source = CountingSource((container("loki-1", 3100),))
+    model = ProxyModel(create_pipeline(tmp_path), source, names=names, convergence=convergence)
+
+    proxy = model.regenerate()
+    assert isinstance(proxy.servers[0], DashboardServer)
+    assert proxy.servers[0].generation
+    assert set(convergence.current) == {"list", "generate"}
+
+    def reject(_: str) -> None:
+        raise subprocess.CalledProcessError(1, ["nginx", "-t"])
+
+    with pytest.raises(subprocess.CalledProcessError):
+        model.publish(reject)
+    assert not convergence.current
+    assert not (tmp_path / "names.json").exists()
+    assert not (tmp_path / "snapshot.json").exists()
+
+    model.publish()
+    assert (tmp_path / "names.json").exists()
+    assert (tmp_path / "snapshot.json").exists()
+    source.containers += (container("loki-2", 3200),)
+    assert [server.host_name for server in model.regenerate().servers] == [
+        "_dashboard", "loki", "loki-2",
+    ]
+
+
+def test_model_discards_phases_of_failed_regeneration(tmp_path: pathlib.Path) -> None:
+    convergence = ConvergenceLog(str(tmp_path / "convergence.json"))
+    model = ProxyModel(
+        create_pipeline(tmp_path),
+        StaticSource((container("grafana-1", 9090),)),
+        convergence=convergence,
+    )
+    with pytest.raises(PortConflictError):
+        model.regenerate()
+    assert not convergence.current
@@ -0,0 +1,165 @@
+import os
+import pathlib
+import stat
+import subprocess
+import sys
+import time
+import pytest
+from docker_container_proxy import BaseProxyConfig, DockerEndpoint, HTTPProxy
+from docker_container_proxy import IPVersion, InvalidLabelError, generate_proxies, list_containers
+from docker_container_proxy import simplify_proxy_host_names
+
+# pylint: disable=redefined-outer-name; (for pytest fixtures)
+
+FAKE_DOCKER = """\
+import json
+import sys
+import time
+
+context = sys.argv[sys.argv.index("--context") + 1] if "--context" in sys.argv else "default"
+if context == "slow":
+    time.sleep(5)
+if context == "broken":
+    sys.exit(1)
+if context == "labelled":
+    template = sys.argv[sys.argv.index("--format") + 1]
+    assert "json .Labels" not in template and '.Label "proxy.ports"' in template
+    print(json.dumps({
+        "ID": "c0ffee",
+        "Names": "api",
+        "Ports": "0.0.0.0:8100->3000/tcp",
+        "CreatedAt": "2024-01-01 00:00:00 +0000 UTC",
+        "Labels": {"": "", "proxy.ports": "3000,9229"},
+        "LabelNames": ["", "proxy.ports"],
+    }))
+    sys.exit(0)
+if context == "misspelled":
+    print(json.dumps({
+        "Names": "api",
+        "Ports": "0.0.0.0:8100->3000/tcp",
+        "Labels": {"": ""},
+        "LabelNames": ["", "proxy.gzpi"],
+    }))
+    sys.exit(0)
+name = "web" if context.startswith("twin") else context + "-web"
+print(json.dumps({"Names": name, "Ports": "0.0.0.0:8000->80/tcp", "Labels": ""}))
+"""
+
+
+@pytest.fixture
+def fake_docker(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    script = os.path.join(tmp_path, "docker")
+    with open(script, "w", encoding="us-ascii") as script_file:
+        script_file.write(f"#!{sys.executable}\n" + FAKE_DOCKER)
+    os.chmod(script, stat.S_IRWXU)
+    monkeypatch.setenv("PATH", str(tmp_path) + os.pathsep + os.environ["PATH"])
+
+
+@pytest.mark.usefixtures("fake_docker")
+def test_default_endpoint() -> None:
+    containers = list(list_containers())
+    assert [container.name for container in containers] == ["default-web"]
+    assert containers[0].proxied_host is None
+
+
+@pytest.mark.usefixtures("fake_docker")
+def test_merges_endpoints_with_proxied_hosts() -> None:
+    endpoints = (
+        DockerEndpoint(address="rootless"),
+        DockerEndpoint(address="build", proxied_host="10.0.0.5"),
+    )
+    containers = list(list_containers(endpoints))
+    assert [container.name for container in containers] == ["rootless-web", "build-web"]
+    assert [container.proxied_host for container in containers] == [None, "10.0.0.5"]
+
+
+@pytest.mark.usefixtures("fake_docker")
+def test_qualifies_names_used_on_several_endpoints() -> None:
+    endpoints = (
+        DockerEndpoint(address="twin-a"),
+        DockerEndpoint(address="twin.b", proxied_host="10.0.0.6"),
+    )
+    containers = list(list_containers(endpoints))
+    assert [container.name for container in containers] == ["web", "web"]
+    assert [container.qualified_name for container in containers] == ["web", "web-twin-b"]
+
+    config = BaseProxyConfig(listen=8080, proxy_host="localhost", domain="test")
+    servers = tuple(
+        simplify_proxy_host_names(generate_proxies(containers, (80,), IPVersion.V4, config))
+    )
+    # both proxy port 8000, on different hosts
+    HTTPProxy(
+        pid_file="nginx.pid",
+        error_log_file="error.log",
+        access_log_file="access.log",
+        listen=8080,
+        servers=servers,
+    )
+    assert [(server.host_name, server.proxied_host) for server in servers] == [
+        ("web", "localhost"),
+        ("web-twin-b", "10.0.0.6"),
+    ]
+
+
+@pytest.mark.usefixtures("fake_docker")
+def test_skips_slow_and_broken_endpoints() -> None:
+    endpoints = (
+        DockerEndpoint(address="slow"),
+        DockerEndpoint(address="broken"),
+        DockerEndpoint(address="fast"),
+    )
+    start = time.monotonic()
+    containers = list(list_containers(endpoints, timeout=1.0))
+    assert time.monotonic() - start < 4
+    assert [container.name for container in containers] == ["fast-web"]
+
+
+@pytest.mark.usefixtures("fake_docker")
+def test_requests_minimal_format() -> None:
+    (container,) = list_containers((DockerEndpoint(address="labelled"),))
+    assert container.container_id == "c0ffee"
+    assert container.labels == (("proxy.ports", "3000,9229"),)
+
+
+@pytest.mark.usefixtures("fake_docker")
+def test_reports_unknown_labels() -> None:
+    (container,) = list_containers((DockerEndpoint(address="misspelled"),))
+    assert container.labels == (("proxy.gzpi", ""),)
+    config = BaseProxyConfig(listen=8080, proxy_host="localhost", domain="test")
+    with pytest.raises(InvalidLabelError, match="unknown label proxy.gzpi"):
+        list(generate_proxies((container,), (3000,), IPVersion.V4, config))
+
+
+@pytest.mark.usefixtures("fake_docker")
+def test_errors_when_all_endpoints_fail() -> None:
+    with pytest.raises(subprocess.CalledProcessError):
+        list_containers((DockerEndpoint(address="broken"),))
+
+
+def test_no_endpoints() -> None:
+    assert not list(list_containers(()))
+
+
+@pytest.mark.parametrize(
+    "arg,expected_endpoint",
+    [
+        pytest.param("rootless", DockerEndpoint(address="rootless"), id="context"),
+        pytest.param(
+            "ssh://build=10.0.0.5",
+            DockerEndpoint(address="ssh://build", proxied_host="10.0.0.5"),
+            id="URL with proxied host",
+        ),
+    ]
+)
+def test_endpoint_from_cli_arg(arg: str, expected_endpoint: DockerEndpoint) -> None:
+    assert DockerEndpoint.from_cli_arg(arg) == expected_endpoint
+
+
+def test_endpoint_docker_command() -> None:
+    assert DockerEndpoint().docker_command() == ["docker"]
+    assert DockerEndpoint(address="rootless").docker_command() == [
+        "docker", "--context", "rootless",
+    ]
+    assert DockerEndpoint(address="tcp://h:2375").docker_command() == [
+        "docker", "--host", "tcp://h:2375",
+    ]
@@ -0,0 +1,73 @@
+import asyncio
+import time
+import pytest
+from benchmarks import load, nginx_buffers, nginx_load
+
+
+@pytest.mark.skipif(not nginx_load.nginx_available(), reason="nginx is not installed")
+def test_variants_serve_requests() -> None:
+    results = nginx_load.run(backend_count=2, concurrency=2, duration=0.2)
+    assert set(results) == set(nginx_load.VARIANTS)
+    for result in results.values():
+        assert result.requests > 0
+        assert result.errors == 0
+    # the stub backends send 1k of the same byte
+    assert results["gzip"].body_bytes < results["gzip"].requests * 100
+    assert results["default"].body_bytes == results["default"].requests * 1024
+
+
+@pytest.mark.skipif(not nginx_load.nginx_available(), reason="nginx is not installed")
+def test_buffer_profiles_serve_requests() -> None:
+    results = nginx_buffers.run(response_size=256 * 1024, concurrency=2, duration=0.2)
+    assert set(results) == {"default", "api", "assets"}
+    for result, _ in results.values():
+        assert result.requests > 0
+        assert result.errors == 0
+
+
+def test_load_generator_reads_chunked_responses() -> None:
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                assert b"\r\nAccept-Encoding: gzip\r\n" in head
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n"
+                    b"5;ext=1\r\nhello\r\n6\r\n world\r\n0\r\nX-Trailer: 1\r\n\r\n"
+                )
+                await writer.drain()
+        except asyncio.IncompleteReadError:
+            writer.close()
+
+    async def run() -> load.LoadResult:
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        async with server:
+            return await load.drive_load(
+                load.server_port(server), ["stub.test"], 1, 0.1, [("Accept-Encoding", "gzip")],
+            )
+
+    result = asyncio.run(run())
+    assert result.requests > 0
+    assert result.errors == 0
+    assert result.body_bytes == result.requests * 11
+
+
+def test_slow_clients_pause_between_reads() -> None:
+
+    async def run() -> tuple[load.LoadResult, float]:
+        servers = await load.start_stub_backends(1, b"x" * 64 * 1024)
+        start = time.monotonic()
+        result = await load.drive_load(
+            load.server_port(servers[0]), ["stub.test"], 1, 0.01, read_pause=0.02,
+        )
+        elapsed = time.monotonic() - start
+        for server in servers:
+            server.close()
+        return result, elapsed
+
+    result, elapsed = asyncio.run(run())
+    assert result.errors == 0
+    assert result.body_bytes == result.requests * 64 * 1024
+    # 4 reads of 16k per response, each followed by a pause
+    assert elapsed >= result.requests * 4 * 0.02
@@ -8,7 +8,7 @@ def test_properties() -> None:
     container = create_container_stub(name="a-rose", exposed_port=1337)
     config = BaseProxyConfig(listen=8080, proxy_host="10.0.0.30", domain="invalid")
 
-    servers = list(generate_proxies((container,), 80, IPVersion.V4, config))
+    servers = list(generate_proxies((container,), (80,), IPVersion.V4, config))
 
     assert len(servers) == 1
     assert servers[0].host_name == "a-rose"
@@ -27,7 +27,7 @@ def test_skips_containers_without_exposed_port() -> None:
     )
     config = BaseProxyConfig(listen=8080, proxy_host="10.0.1.40", domain="test")
 
-    servers = list(generate_proxies(containers, 80, IPVersion.V4, config))
+    servers = list(generate_proxies(containers, (80,), IPVersion.V4, config))
 
     assert len(servers) == 2
     assert servers[0].host_name == "pick-me"
@@ -40,7 +40,7 @@ def test_errors_on_port_conflict() -> None:
     container = create_container_stub(name="foobar", exposed_port=8080)
     config = BaseProxyConfig(listen=8080, proxy_host="10.0.2.50", domain="example")
     with pytest.raises(PortConflictError):
-        list(generate_proxies((container,), 80, IPVersion.V4, config))
+        list(generate_proxies((container,), (80,), IPVersion.V4, config))
 
 
 def create_container_stub(name: str, exposed_port: Optional[int]) -> DockerContainer:
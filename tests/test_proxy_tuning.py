@@ -0,0 +1,134 @@
+from typing import Dict, List, Tuple, Union
+import pytest
+from docker_container_proxy import IPVersion, BaseProxyConfig, DockerContainer, PortMapping
+from docker_container_proxy import HTTPProxyServer, ProxyTuning, InvalidLabelError
+from docker_container_proxy import parse_labels, generate_proxies
+
+
+@pytest.mark.parametrize(
+    "input_labels,expected_parsed_labels",
+    [
+        pytest.param(
+            "com.docker.compose.project=foo,proxy.gzip=on,proxy.buffering=off",
+            [("proxy.buffering", "off"), ("proxy.gzip", "on")],
+            id="mixed labels",
+        ),
+        pytest.param(
+            "com.docker.compose.project=foo",
+            [],
+            id="no proxy labels",
+        ),
+        pytest.param(
+            "",
+            [],
+            id="no labels",
+        ),
+        pytest.param(
+            "proxy.invalid,proxy.read_timeout=5m",
+            [("proxy.read_timeout", "5m")],
+            id="label without value",
+        ),
+        pytest.param(
+            "com.example=a,proxy.ports=3000,9229,proxy.gzip=on",
+            [("proxy.gzip", "on"), ("proxy.ports", "3000,9229")],
+            id="value with commas",
+        ),
+        pytest.param(
+            {"": "", "proxy.ports": "3000,9229", "proxy.gzip": "on"},
+            [("proxy.gzip", "on"), ("proxy.ports", "3000,9229")],
+            id="mapping from the minimal format",
+        ),
+    ]
+)
+def test_label_parsing(
+    input_labels: Union[str, Dict[str, str]],
+    expected_parsed_labels: List[Tuple[str, str]],
+) -> None:
+    assert list(parse_labels(input_labels)) == expected_parsed_labels
+
+
+def test_tuning_from_labels() -> None:
+    tuning = ProxyTuning.from_labels({
+        "proxy.buffering": "off",
+        "proxy.websocket": "true",
+        "proxy.gzip": "on",
+        "proxy.read_timeout": "1h",
+        "proxy.send_timeout": "90s",
+        "proxy.client_max_body_size": "100m",
+        "com.example.unrelated": "whatever",
+    })
+    assert tuning == ProxyTuning(
+        buffering=False,
+        websocket=True,
+        gzip=True,
+        read_timeout="1h",
+        send_timeout="90s",
+        client_max_body_size="100m",
+    )
+
+
+@pytest.mark.parametrize(
+    "labels",
+    [
+        pytest.param({"proxy.buffering": "maybe"}, id="invalid switch"),
+        pytest.param({"proxy.read_timeout": "forever"}, id="invalid time"),
+        pytest.param({"proxy.client_max_body_size": "1t"}, id="invalid size"),
+        pytest.param({"proxy.client_max_body_size": "1m; return 200"}, id="directive injection"),
+        pytest.param({"proxy.ports": "80,http"}, id="invalid ports"),
+        pytest.param({"proxy.ports": "80,80"}, id="repeated ports"),
+        pytest.param({"proxy.unknown": "on"}, id="unknown label"),
+    ]
+)
+def test_invalid_labels(labels: Dict[str, str]) -> None:
+    with pytest.raises(InvalidLabelError):
+        ProxyTuning.from_labels(labels)
+
+
+def test_tuned_proxy_server_config() -> None:
+    server = HTTPProxyServer(
+        host_name="events",
+        domain="example.com",
+        listen=80,
+        proxied_host="192.168.0.10",
+        proxied_port=8080,
+        docker_container=DockerContainer(name="events-backend", ports=()),
+        tuning=ProxyTuning(buffering=False, websocket=True, client_max_body_size="10m"),
+    )
+    assert server.config() == """\
+server {
+    listen 80;
+    server_name events.example.com;
+    location / {
+        proxy_pass http://192.168.0.10:8080;
+        proxy_buffering off;
+        proxy_http_version 1.1;
+        proxy_set_header Upgrade $http_upgrade;
+        proxy_set_header Connection $http_connection;
+        client_max_body_size 10m;
+    }
+}
+"""
+
+
+def test_generation_applies_labels() -> None:
+    container = DockerContainer(
+        name="uploads",
+        ports=(PortMapping(exposed=8000, internal=80, ip_version=IPVersion.V4),),
+        labels=(("proxy.client_max_body_size", "1g"),),
+    )
+    config = BaseProxyConfig(listen=8080, proxy_host="localhost", domain="test")
+
+    servers = list(generate_proxies((container,), (80,), IPVersion.V4, config))
+
+    assert servers[0].tuning == ProxyTuning(client_max_body_size="1g")
+
+
+def test_generation_errors_on_invalid_label() -> None:
+    container = DockerContainer(
+        name="uploads",
+        ports=(PortMapping(exposed=8000, internal=80, ip_version=IPVersion.V4),),
+        labels=(("proxy.gzip", "yes please"),),
+    )
+    config = BaseProxyConfig(listen=8080, proxy_host="localhost", domain="test")
+    with pytest.raises(InvalidLabelError):
+        list(generate_proxies((container,), (80,), IPVersion.V4, config))
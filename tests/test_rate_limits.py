@@ -0,0 +1,85 @@
+from docker_container_proxy import IPVersion, BaseProxyConfig, DockerContainer, PortMapping
+from docker_container_proxy import HTTPProxyServer, HTTPProxy, ProxyTuning
+from docker_container_proxy import generate_proxies, limit_zone_directives
+
+
+def create_server(host_name: str, proxied_port: int, tuning: ProxyTuning) -> HTTPProxyServer:
+    return HTTPProxyServer(
+        host_name=host_name,
+        domain="limits.test",
+        listen=8000,
+        proxied_host="127.0.0.1",
+        proxied_port=proxied_port,
+        docker_container=DockerContainer(name=host_name, ports=()),
+        tuning=tuning,
+    )
+
+
+def test_labels_override_defaults() -> None:
+    defaults = ProxyTuning(rate_limit="10r/s", burst=20, connection_limit=8)
+    tuning = ProxyTuning.from_labels({"proxy.rate_limit": "100r/s"}, defaults)
+    assert tuning == ProxyTuning(rate_limit="100r/s", burst=20, connection_limit=8)
+
+
+def test_generation_applies_defaults() -> None:
+    container = DockerContainer(
+        name="busy",
+        ports=(PortMapping(exposed=8000, internal=80, ip_version=IPVersion.V4),),
+    )
+    config = BaseProxyConfig(
+        listen=8080,
+        proxy_host="localhost",
+        domain="test",
+        default_tuning=ProxyTuning(connection_limit=4),
+    )
+
+    servers = list(generate_proxies((container,), (80,), IPVersion.V4, config))
+
+    assert servers[0].tuning == ProxyTuning(connection_limit=4)
+
+
+def test_server_limit_directives() -> None:
+    tuning = ProxyTuning(rate_limit="5r/s", burst=10, connection_limit=2)
+    assert tuning.directives() == (
+        "limit_req zone=requests_per_server_5r_s burst=10 nodelay",
+        "limit_conn connections_per_server 2",
+    )
+
+
+def test_zone_per_rate() -> None:
+    directives = limit_zone_directives([
+        ProxyTuning(rate_limit="5r/s"),
+        ProxyTuning(rate_limit="600r/m", connection_limit=1),
+        ProxyTuning(rate_limit="5r/s"),
+        ProxyTuning(),
+    ])
+    assert directives[:3] == [
+        "limit_req_zone $server_name zone=requests_per_server_5r_s:32k rate=5r/s;",
+        "limit_req_zone $server_name zone=requests_per_server_600r_m:32k rate=600r/m;",
+        "limit_conn_zone $server_name zone=connections_per_server:32k;",
+    ]
+    assert "limit_req_status 429;" in directives
+    assert "limit_conn_status 503;" in directives
+
+
+def test_zone_size_grows_with_servers() -> None:
+    directives = limit_zone_directives([ProxyTuning(connection_limit=1)] * 1000)
+    assert directives[0] == "limit_conn_zone $server_name zone=connections_per_server:125k;"
+
+
+def test_no_limits() -> None:
+    assert not limit_zone_directives([ProxyTuning(gzip=True)])
+
+
+def test_limits_are_logged() -> None:
+    proxy = HTTPProxy(
+        pid_file="/run/nginx.pid",
+        error_log_file="/var/log/nginx/error.log",
+        access_log_file="/var/log/nginx/access.log",
+        listen=8080,
+        servers=(create_server("limited", 8001, ProxyTuning(rate_limit="1r/s")),),
+    )
+    config = proxy.config()
+    assert "access_log /var/log/nginx/access.log limits;" in config
+    assert config.index("log_format limits") < config.index("access_log")
+    assert "limit_req=$limit_req_status limit_conn=$limit_conn_status" in config
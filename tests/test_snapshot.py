@@ -0,0 +1,94 @@
+import json
+import os
+import pathlib
+import pytest
+from docker_container_proxy import DockerContainer, HTTPProxyServer, DashboardServer, HTTPProxy
+from docker_container_proxy import Generator, SnapshotError, read_snapshot
+
+
+def create_proxy(pid_file: str) -> HTTPProxy:
+    proxy_server = HTTPProxyServer(
+        host_name="shop",
+        domain="example.com",
+        listen=80,
+        proxied_host="192.168.0.20",
+        proxied_port=8080,
+        docker_container=DockerContainer(name="shop-backend", ports=(), container_id="abc"),
+    )
+    dashboard_server = DashboardServer(
+        host_name="_dashboard",
+        domain="example.com",
+        listen=80,
+        proxy_servers=(proxy_server,),
+    )
+    return HTTPProxy(
+        pid_file=pid_file,
+        error_log_file="error.log",
+        access_log_file="access.log",
+        listen=80,
+        servers=(dashboard_server, proxy_server),
+    )
+
+
+def test_snapshot_contents(tmp_path: pathlib.Path) -> None:
+    generator = Generator(name="FooBar 2.0", path_prefix=str(tmp_path))
+    generator.write_snapshot(create_proxy(str(tmp_path / "nginx.pid")), "nginx")
+
+    snapshot = read_snapshot(generator.snapshot_file)
+
+    assert snapshot["generator"] == "FooBar 2.0"
+    assert snapshot["engine"] == "nginx"
+    assert snapshot["age"] >= 0
+    assert snapshot["servers"] == [
+        {
+            "info": "dashboard",
+            "server_name": "_dashboard.example.com",
+            "url": "http://_dashboard.example.com:80/",
+        },
+        {
+            "info": "HTTP proxy for Docker container shop-backend",
+            "server_name": "shop.example.com",
+            "url": "http://shop.example.com:80/",
+            "container": "shop-backend",
+            "container_id": "abc",
+            "proxied_host": "192.168.0.20",
+            "proxied_port": 8080,
+        },
+    ]
+
+
+def test_proxy_state(tmp_path: pathlib.Path) -> None:
+    generator = Generator(name="FooBar 2.0", path_prefix=str(tmp_path))
+    pid_file = tmp_path / "nginx.pid"
+    generator.write_snapshot(create_proxy(str(pid_file)), "nginx")
+
+    assert read_snapshot(generator.snapshot_file)["running"] is False
+    pid_file.write_text(f"{os.getpid()}\n", encoding="us-ascii")
+    assert read_snapshot(generator.snapshot_file)["running"] is True
+
+
+def test_built_in_engine_state(tmp_path: pathlib.Path) -> None:
+    generator = Generator(name="FooBar 2.0", path_prefix=str(tmp_path))
+    generator.write_snapshot(create_proxy(str(tmp_path / "nginx.pid")), "asyncio")
+    snapshot = read_snapshot(generator.snapshot_file)
+    assert snapshot["pid"] == os.getpid()
+    assert snapshot["running"] is True
+
+
+def test_stale_snapshot(tmp_path: pathlib.Path) -> None:
+    generator = Generator(name="FooBar 2.0", path_prefix=str(tmp_path))
+    generator.write_snapshot(create_proxy(str(tmp_path / "nginx.pid")), "nginx")
+    with open(generator.snapshot_file, "r", encoding="utf-8") as snapshot_file:
+        snapshot = json.load(snapshot_file)
+    snapshot["generated_at"] -= 3600
+    with open(generator.snapshot_file, "w", encoding="utf-8") as snapshot_file:
+        json.dump(snapshot, snapshot_file)
+
+    assert read_snapshot(generator.snapshot_file, max_age=7200)["age"] >= 3600
+    with pytest.raises(SnapshotError):
+        read_snapshot(generator.snapshot_file, max_age=60)
+
+
+def test_missing_snapshot(tmp_path: pathlib.Path) -> None:
+    with pytest.raises(SnapshotError):
+        read_snapshot(str(tmp_path / "snapshot.json"))
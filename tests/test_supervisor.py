@@ -0,0 +1,173 @@
+import argparse
+import os
+import pathlib
+import signal
+import stat
+import subprocess
+import sys
+import threading
+import time
+from typing import Iterator
+import pytest
+import docker_container_proxy
+from docker_container_proxy import InvalidLabelError, NginxSupervisor, check_engine_args
+from docker_container_proxy import child_pids, restart_proxy
+
+# pylint: disable=redefined-outer-name; (for pytest fixtures)
+
+# nginx stand-in: a master process that writes its PID file, runs a worker
+# process and replaces it with a new one on SIGHUP
+FAKE_NGINX = """\
+import os
+import signal
+import subprocess
+import sys
+import time
+
+if "-t" in sys.argv:
+    sys.exit(1 if os.path.exists(os.environ["FAKE_NGINX_INVALID"]) else 0)
+with open(os.environ["FAKE_NGINX_PID"], "w") as pid_file:
+    pid_file.write(str(os.getpid()))
+worker_command = [sys.executable, "-c", "import time; time.sleep(60)"]
+workers = [subprocess.Popen(worker_command)]
+
+def reload(*_):
+    workers.append(subprocess.Popen(worker_command))
+    workers.pop(0).terminate()
+
+def stop(*_):
+    for worker in workers:
+        worker.terminate()
+    sys.exit(0)
+
+signal.signal(signal.SIGHUP, reload)
+signal.signal(signal.SIGQUIT, stop)
+signal.signal(signal.SIGTERM, stop)
+while True:
+    time.sleep(1)
+"""
+
+
+@pytest.fixture
+def fake_nginx(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> str:
+    binary = tmp_path / "nginx"
+    binary.write_text(f"#!{sys.executable}\n" + FAKE_NGINX, encoding="us-ascii")
+    os.chmod(binary, stat.S_IRWXU)
+    monkeypatch.setenv("FAKE_NGINX_PID", str(tmp_path / "nginx.pid"))
+    monkeypatch.setenv("FAKE_NGINX_INVALID", str(tmp_path / "invalid"))
+    return str(binary)
+
+
+@pytest.fixture
+def supervisor(tmp_path: pathlib.Path, fake_nginx: str) -> Iterator[NginxSupervisor]:
+    supervisor = NginxSupervisor(
+        str(tmp_path / "nginx.conf"),
+        str(tmp_path / "nginx.pid"),
+        fake_nginx,
+    )
+    yield supervisor
+    supervisor.stop()
+
+
+def test_start_waits_for_workers(supervisor: NginxSupervisor) -> None:
+    supervisor.start()
+    assert supervisor.process is not None
+    assert supervisor.workers
+    assert supervisor.workers <= child_pids(supervisor.process.pid)
+
+
+def test_start_removes_stale_pid_file(tmp_path: pathlib.Path, supervisor: NginxSupervisor) -> None:
+    (tmp_path / "nginx.pid").write_text("999999999", encoding="us-ascii")
+    supervisor.start()
+    assert supervisor.process is not None
+    assert (tmp_path / "nginx.pid").read_text(encoding="us-ascii") == str(supervisor.process.pid)
+
+
+def test_reload_waits_for_new_workers(supervisor: NginxSupervisor) -> None:
+    supervisor.start()
+    previous_workers = supervisor.workers
+
+    latency = supervisor.reload()
+
+    assert latency > 0
+    assert supervisor.workers
+    assert not supervisor.workers & previous_workers
+
+
+def test_reload_checks_config(tmp_path: pathlib.Path, supervisor: NginxSupervisor) -> None:
+    supervisor.start()
+    (tmp_path / "invalid").touch()
+    with pytest.raises(subprocess.CalledProcessError):
+        supervisor.reload()
+
+
+def test_restarts_after_exit(supervisor: NginxSupervisor, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(NginxSupervisor, "MAX_BACKOFF", 0.1)
+    supervisor.start()
+    assert supervisor.process is not None
+    first_pid = supervisor.process.pid
+    thread = threading.Thread(target=supervisor.supervise, args=(lambda: None,))
+    thread.start()
+    try:
+        os.kill(first_pid, signal.SIGKILL)
+        deadline = time.monotonic() + 5
+        while supervisor.process.pid == first_pid and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert supervisor.process.pid != first_pid
+        assert supervisor.process.poll() is None
+    finally:
+        supervisor.stopping = True
+        thread.join()
+
+
+def test_keeps_running_when_regeneration_fails(supervisor: NginxSupervisor) -> None:
+    supervisor.start()
+    assert supervisor.process is not None
+    attempts = []
+
+    def regenerate() -> None:
+        attempts.append(time.monotonic())
+        raise InvalidLabelError("container web has an invalid label: unknown label proxy.gzpi")
+
+    thread = threading.Thread(target=supervisor.supervise, args=(regenerate,))
+    thread.start()
+    try:
+        supervisor.reload_requested = True
+        deadline = time.monotonic() + 5
+        while not attempts and time.monotonic() < deadline:
+            time.sleep(0.05)
+        time.sleep(0.3)
+        assert attempts
+        assert thread.is_alive()
+        assert supervisor.process.poll() is None
+    finally:
+        supervisor.stopping = True
+        thread.join()
+
+
+def test_restart_proxy_ignores_stale_pid_file(
+    tmp_path: pathlib.Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    pid_file = tmp_path / "nginx.pid"
+    pid_file.write_text("999999999", encoding="us-ascii")
+    commands = []
+    monkeypatch.setattr(
+        docker_container_proxy.subprocess,
+        "run",
+        lambda command, **_: commands.append(command),
+    )
+
+    restart_proxy("nginx.conf", str(pid_file))
+
+    assert commands == [[docker_container_proxy.NGINX_BINARY, "-c", "nginx.conf"]]
+    assert not pid_file.exists()
+
+
+def test_supervise_requires_procfs(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(docker_container_proxy, "has_procfs", lambda: False)
+    args = argparse.Namespace(tls_port=None, engine="nginx", supervise=True, dns_port=None)
+    with pytest.raises(SystemExit, match="/proc"):
+        check_engine_args(args)
+    args.supervise = False
+    check_engine_args(args)
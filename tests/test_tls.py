@@ -0,0 +1,131 @@
+import os
+import pathlib
+import shutil
+import subprocess
+import pytest
+from docker_container_proxy import DockerContainer, HTTPProxyServer, HTTPProxy, LocalCertificate
+
+requires_openssl = pytest.mark.skipif(
+    shutil.which("openssl") is None,
+    reason="openssl is not installed",
+)
+
+
+def create_server(tls_listen: int = 443) -> HTTPProxyServer:
+    return HTTPProxyServer(
+        host_name="secure",
+        domain="docker.test",
+        listen=80,
+        tls_listen=tls_listen,
+        proxied_host="127.0.0.1",
+        proxied_port=8443,
+        docker_container=DockerContainer(name="secure-backend", ports=()),
+    )
+
+
+def test_tls_server_config() -> None:
+    server = create_server()
+    assert server.url == "https://secure.docker.test:443/"
+    assert server.config() == """\
+server {
+    listen 80;
+    listen 443 ssl http2;
+    server_name secure.docker.test;
+    location / {
+        proxy_pass http://127.0.0.1:8443;
+    }
+}
+"""
+
+
+def test_tls_proxy_config() -> None:
+    server = create_server()
+    # mocker.patch.object doesn't work on frozen dataclasses
+    object.__setattr__(server, "config", lambda: "---- PROXY CONFIG HERE ----")
+    proxy = HTTPProxy(
+        pid_file="/run/nginx.pid",
+        error_log_file="/var/log/nginx/error.log",
+        access_log_file="/var/log/nginx/access.log",
+        listen=80,
+        servers=(server,),
+        tls_listen=443,
+        certificate=LocalCertificate.for_domain("/etc/tls", "docker.test"),
+    )
+    assert proxy.config() == """\
+pid /run/nginx.pid;
+error_log /var/log/nginx/error.log;
+
+events { }
+
+http {
+    access_log /var/log/nginx/access.log;
+    ssl_certificate /etc/tls/wildcard.docker.test.crt;
+    ssl_certificate_key /etc/tls/wildcard.docker.test.key;
+    ssl_protocols TLSv1.2 TLSv1.3;
+    ssl_session_cache shared:SSL:10m;
+    ssl_session_timeout 1d;
+    ssl_session_tickets on;
+    ssl_session_ticket_key /etc/tls/session_ticket.key;
+
+    server {
+        listen 80 default_server;
+        listen 443 ssl http2 default_server;
+        server_name _;
+        return 400;
+    }
+
+    ---- PROXY CONFIG HERE ----
+}
+"""
+
+
+@requires_openssl
+def test_certificate_generation(tmp_path: pathlib.Path) -> None:
+    certificate = LocalCertificate.for_domain(str(tmp_path), "docker.test")
+
+    assert certificate.ensure("docker.test") is True
+
+    subprocess.run(
+        [
+            "openssl", "verify", "-CAfile", certificate.ca_certificate_file,
+            certificate.certificate_file,
+        ],
+        check=True,
+        capture_output=True,
+    )
+    text = subprocess.run(
+        ["openssl", "x509", "-noout", "-text", "-in", certificate.certificate_file],
+        check=True,
+        capture_output=True,
+    ).stdout
+    assert b"DNS:*.docker.test" in text
+    assert os.path.getsize(certificate.session_ticket_key_file) == 80
+
+
+@requires_openssl
+def test_certificate_is_reused(tmp_path: pathlib.Path) -> None:
+    certificate = LocalCertificate.for_domain(str(tmp_path), "docker.test")
+    certificate.ensure("docker.test")
+    with open(certificate.certificate_file, "rb") as certificate_file:
+        contents = certificate_file.read()
+
+    assert certificate.ensure("docker.test") is False
+    with open(certificate.certificate_file, "rb") as certificate_file:
+        assert certificate_file.read() == contents
+
+
+@requires_openssl
+def test_expiring_certificate_is_regenerated(
+    tmp_path: pathlib.Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    certificate = LocalCertificate.for_domain(str(tmp_path), "docker.test")
+    monkeypatch.setattr(LocalCertificate, "VALIDITY_DAYS", 1)
+    certificate.ensure("docker.test")
+    with open(certificate.ca_certificate_file, "rb") as ca_certificate_file:
+        ca_contents = ca_certificate_file.read()
+
+    monkeypatch.setattr(LocalCertificate, "VALIDITY_DAYS", 397)
+    assert certificate.ensure("docker.test") is True
+    with open(certificate.ca_certificate_file, "rb") as ca_certificate_file:
+        assert ca_certificate_file.read() == ca_contents
@@ -0,0 +1,59 @@
+import pytest
+from docker_container_proxy import DockerContainer, HTTPProxyServer, ProxyTuning, InvalidLabelError
+
+
+def create_server(tuning: ProxyTuning) -> HTTPProxyServer:
+    return HTTPProxyServer(
+        host_name="billing",
+        domain="internal",
+        listen=8800,
+        proxied_host="127.0.0.1",
+        proxied_port=32768,
+        docker_container=DockerContainer(name="billing-api-1", ports=()),
+        tuning=tuning,
+    )
+
+
+def test_timeouts_and_retries() -> None:
+    tuning = ProxyTuning.from_labels({
+        "proxy.connect_timeout": "500ms",
+        "proxy.next_upstream": "error,timeout",
+    })
+    assert tuning == ProxyTuning(connect_timeout="500ms", next_upstream="error timeout")
+    assert create_server(tuning).config() == """\
+server {
+    listen 8800;
+    server_name billing.internal;
+    location / {
+        proxy_pass http://127.0.0.1:32768;
+        proxy_connect_timeout 500ms;
+        proxy_next_upstream error timeout;
+    }
+}
+"""
+
+
+def test_error_page() -> None:
+    config = create_server(ProxyTuning(error_page=True)).config()
+    uri = HTTPProxyServer.ERROR_PAGE_URI
+    assert f"        error_page 502 504 {uri};\n    }}\n    location = {uri} {{\n" in config
+    assert "        internal;\n        default_type text/html;\n        return 502 '" in config
+    page = config.split("return 502 '")[1].split("';\n")[0]
+    assert "billing-api-1" in page
+    assert '<a href="http://_dashboard.internal:8800/">' in page
+    assert "'" not in page
+
+
+@pytest.mark.parametrize(
+    "labels",
+    [
+        pytest.param({"proxy.connect_timeout": "0"}, id="zero timeout"),
+        pytest.param({"proxy.next_upstream": "sometimes"}, id="unknown condition"),
+        pytest.param({"proxy.next_upstream": "off timeout"}, id="off with conditions"),
+        pytest.param({"proxy.next_upstream": ""}, id="no conditions"),
+        pytest.param({"proxy.error_page": "custom"}, id="invalid switch"),
+    ]
+)
+def test_invalid_labels(labels: dict[str, str]) -> None:
+    with pytest.raises(InvalidLabelError):
+        ProxyTuning.from_labels(labels)
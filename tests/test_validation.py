@@ -20,6 +20,19 @@ def test_server_port_conflict() -> None:
         )
 
 
+def test_server_tls_port_conflict() -> None:
+    with pytest.raises(PortConflictError):
+        HTTPProxyServer(
+            host_name="www",
+            domain="example.com",
+            listen=80,
+            tls_listen=8443,
+            proxied_host="localhost",
+            proxied_port=8443,
+            docker_container=DockerContainer(name="x", ports=()),
+        )
+
+
 def test_proxy_without_servers() -> None:
     with pytest.raises(ValueError):
         HTTPProxy(
@@ -31,6 +44,18 @@ def test_proxy_without_servers() -> None:
         )
 
 
+def test_proxy_tls_without_certificate() -> None:
+    with pytest.raises(ValueError):
+        HTTPProxy(
+            pid_file="foo.pid",
+            access_log_file="access.log",
+            error_log_file="error.log",
+            listen=80,
+            tls_listen=443,
+            servers=(DashboardServer(host_name="x", domain="y", listen=80, proxy_servers=()),),
+        )
+
+
 def test_proxy_with_conflicting_servers() -> None:
     proxy_servers = (
         HTTPProxyServer(
@@ -45,7 +70,7 @@ def test_proxy_with_conflicting_servers() -> None:
             host_name="blog",
             domain="example.org",
             listen=8081,
-            proxied_host="127.0.0.1",
+            proxied_host="localhost",
             proxied_port=80,
             docker_container=DockerContainer(name="y", ports=()),
         ),
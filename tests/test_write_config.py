@@ -2,6 +2,7 @@ import os
 import os.path
 import random
 import string
+import subprocess
 import tempfile
 from typing import Iterator
 import pytest
@@ -45,3 +46,18 @@ def test_write_config_contents(path_prefix: str) -> None:
     with open(config_filename, "rb") as config_file:
         config_contents = config_file.read()
     assert config_contents == b"# configuration generated automatically by FooBar 2.0\n\nverify me"
+
+
+def test_rejected_config_keeps_previous_one(path_prefix: str) -> None:
+    generator = Generator(name="FooBar 2.0", path_prefix=path_prefix)
+    config_filename = generator.write("previous")
+
+    def reject(filename: str) -> None:
+        with open(filename, "rb") as config_file:
+            assert config_file.read().endswith(b"broken")
+        raise subprocess.CalledProcessError(1, ["nginx", "-t"])
+
+    with pytest.raises(subprocess.CalledProcessError):
+        generator.write("broken", reject)
+    with open(config_filename, "rb") as config_file:
+        assert config_file.read().endswith(b"previous")